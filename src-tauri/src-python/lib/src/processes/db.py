@@ -1,48 +1,200 @@
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
 import pandas as pd
-from copy import deepcopy
 
 from pandas import DataFrame
 
+from lib.src.processes.journal import Journal
+from lib.src.processes.payload import encode_columns
+from lib.src.processes.saver import WriteBehind, write_temp_file
+from lib.src.processes.shared_roster import Layout, share_roster
+from lib.src.processes.sidecar import load_sidecar, save_sidecar
 from lib.src.processes.utils import *
+from lib.src.struct.lru_cache import LRUCache
+from lib.src.struct.roster import Roster, read_csv
+from lib.src.struct.sorted_index import SortedIndex
 from lib.src.struct.students import Student
 
+# Number of journaled edits after which the journal is compacted, i.e. written back into the CSV in the background
+JOURNAL_COMPACT_THRESHOLD = 1000
+
+# Quiet period after an edit before a compaction starts, and the longest it can wait for edits to stop, in seconds
+SAVE_DELAY = 2.0
+SAVE_MAX_DELAY = 30.0
+
+# Number of (task, class) groups `DB.get_complete_epa_marks` keeps for the current marks version
+EPA_GROUP_CACHE_SIZE = 64
+
+# Keys `DB.query_students` can sort by, and the roster column they sort on
+SORT_KEYS = {"id": "ids", "name": "names", "class_id": "classes", "epa": "epas", "average": None}
+
+# Data versions are shared by every DB, so a version from one roster is never mistaken for one of another
+_versions = itertools.count(1)
+
 
 class DB:
-    def __init__(self, path: str):
+    def __init__(self, path: str, sidecar: bool = False):
         """
         Initialize database connection with file path.
 
         Args:
             path: File path to CSV database
+            sidecar: Whether to keep a binary copy of the roster next to the CSV, which is memory-mapped
+                instead of parsing the CSV the next time it is opened
 
         Raises:
             FileNotFoundError: If the specified file doesn't exist
         """
         self._path = path
-        self._objects = []
-        self._file: DataFrame | None = None
+        self._roster = Roster.empty()
+        self._task_indexes: list[SortedIndex | None] = [None] * self._roster.tasks
+        self._rank_columns: list[np.ndarray | None] = [None] * self._roster.tasks
+        self._avg_index: SortedIndex | None = None
+        self._folded_names: np.ndarray | None = None
+        self._complete: tuple[int, np.ndarray] | None = None
+        self._epa_groups = LRUCache(EPA_GROUP_CACHE_SIZE)
+        self._epa_groups_version = 0
+        self._version = self._reset_version = self._marks_version = 0
+        self._row_versions = np.zeros(0, dtype=np.int64)
+        self._frame: DataFrame | None = None
+        self._sidecar = sidecar
+        self._stamp: tuple[int, int] | None = None
+        self._lock = threading.RLock()
+        self._save_lock = threading.Lock()
+        self._journal: Journal | None = None
+        self._saver: WriteBehind | None = None
         if path:
+            self._open_journal()
             self.load().unwrap()
 
     def load(self) -> Result:
         """
         Load student data from CSV file into memory.
 
+        Columns are parsed with explicit types and converted to the roster in bulk, without any per-row
+        Python work. A 1M-row roster should load in about a second. If the sidecar cache is enabled and
+        matches the CSV, it is memory-mapped instead. Edits recorded in the journal since the CSV was last
+        written are replayed on top.
+
         Returns:
             Result[None, Exception]: Success if loaded, Error if file not found
         """
-        try:
-            self._file = pd.read_csv(self._path)
-        except FileNotFoundError as e:
-            return Err(e)
+        with self._lock:
+            try:
+                stamp = self._stat()
+                roster = load_sidecar(self._path, stamp) if self._sidecar else None
+                self._frame = read_csv(self._path) if roster is None else None
+            except FileNotFoundError as e:
+                return Err(e)
+            self._stamp = stamp
 
-        self._objects = []
-        for _, r in self._file.iterrows():
-            self._objects.append(Student.from_row(r))
+            if roster is None:
+                roster = Roster.from_frame(self._frame)
+                if self._sidecar:
+                    save_sidecar(self._path, stamp, roster)
+            self._set_roster(roster)
 
-        self._objects.sort(key=lambda o: o.get_id())
+            if self._journal is not None:
+                entries = self._journal.read()
+                for entry in entries:
+                    pos = self._roster.position(entry["id"])
+                    student = Journal.apply(entry, self._roster.student_at(pos) if pos is not None else None)
+                    if student is not None:
+                        self._upsert(student)
+                if len(entries) >= JOURNAL_COMPACT_THRESHOLD:
+                    self._saver.schedule()
         return Ok()
 
+    @staticmethod
+    def from_roster(roster: Roster) -> "DB":
+        """
+        Create a database over an existing roster, without a file. Nothing is ever saved.
+
+        Args:
+            roster: The students to query
+
+        Returns:
+            DB: A database using the roster as is
+        """
+        db = DB("")
+        db._set_roster(roster)
+        return db
+
+    def share(self) -> tuple[SharedMemory, Layout]:
+        """
+        Copy the current students into shared memory, for worker processes to open with `attach_roster`
+        and `DB.from_roster`. Later changes aren't reflected in the copy.
+
+        Returns:
+            tuple[SharedMemory, Layout]: The block, which the caller must close and unlink, and its layout
+        """
+        with self._lock:
+            return share_roster(self._roster)
+
+    def subset(self, ids) -> "DB":
+        """
+        Create a database over a copy of some of the students, without a file, see `from_roster`.
+
+        Args:
+            ids: IDs of the students to keep
+
+        Returns:
+            DB: A database of the students with those IDs
+        """
+        with self._lock:
+            return DB.from_roster(self._roster.select(np.isin(self._roster.ids, ids)))
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the database lock for a block, so its queries all see the same students and no edit lands in
+        between, e.g. while a mark is predicted in one thread and students are edited in another. The lock
+        is reentrant, so methods that take it themselves can be called within the block.
+
+        Yields:
+            DB: This database
+        """
+        with self._lock:
+            yield self
+
+    def _set_roster(self, roster: Roster) -> None:
+        """
+        Replace every student, resetting the indexes and starting a new data version.
+
+        Args:
+            roster: The new students
+        """
+        self._roster = roster
+        self._task_indexes = [None] * self._roster.tasks
+        self._rank_columns = [None] * self._roster.tasks
+        self._avg_index = None
+        self._folded_names = None
+        self._version = self._reset_version = self._marks_version = next(_versions)
+        self._row_versions = np.zeros(len(self._roster), dtype=np.int64)
+
+    def _open_journal(self) -> None:
+        """
+        Open the journal and background saver for the current path.
+        """
+        self._journal = Journal(self._path)
+        self._saver = WriteBehind(self.update_df, SAVE_DELAY, SAVE_MAX_DELAY, name=f"save {os.path.basename(self._path)}")
+
+    @property
+    def _file(self) -> DataFrame:
+        """
+        The roster in the CSV layout. This is the parsed CSV until the roster is changed or was loaded
+        from the sidecar cache, after which it is rebuilt from the roster on demand.
+        """
+        with self._lock:
+            if self._frame is None:
+                self._frame = self._roster.to_frame()
+            return self._frame
+
     def __len__(self):
         """
         Get number of students in database.
@@ -50,7 +202,7 @@ class DB:
         Returns:
             int: Number of student records
         """
-        return len(self._objects)
+        return len(self._roster)
 
     def get_path(self) -> str:
         """
@@ -61,6 +213,32 @@ class DB:
         """
         return self._path
 
+    def _stat(self) -> tuple[int, int]:
+        """
+        Stat the database file.
+
+        Returns:
+            tuple[int, int]: Modification time in nanoseconds and size in bytes
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+        """
+        st = os.stat(self._path)
+        return st.st_mtime_ns, st.st_size
+
+    def is_stale(self) -> bool:
+        """
+        Check whether the file on disk has changed since it was last loaded or saved by this instance.
+
+        Returns:
+            bool: True if the in-memory data no longer matches the file
+        """
+        with self._lock:
+            try:
+                return self._stat() != self._stamp
+            except FileNotFoundError:
+                return True
+
     def update_path(self, path: str) -> None:
         """
         Update the database file path.
@@ -68,7 +246,9 @@ class DB:
         Args:
             path: New file path to CSV database
         """
+        self.close()
         self._path = path
+        self._open_journal()
         self.load().unwrap()
 
     def get_all(self, _c: int | None = None, include_invalid: bool = True) -> Result:
@@ -78,15 +258,29 @@ class DB:
         Returns:
             Result[List[Student], str]: List of Student objects if found, Error message if not found
         """
-        if not self._objects:
-            return Err("No students found")
-        students = [o for o in self._objects if o.get_class() == _c] if _c is not None else self._objects
-        invalid_students = self.get_all_with_missing_tasks().unwrap_or([])
+        with self._lock:
+            if not len(self._roster):
+                return Err("No students found")
+            mask = self._class_mask(_c)
+
+            # Filter out invalid students if include_invalid is False
+            if not include_invalid:
+                mask &= ~self._roster.missing.any(axis=1)
+            return Ok(self._roster.students_at(np.flatnonzero(mask)))
+
+    def _class_mask(self, _c: int | None) -> np.ndarray:
+        """
+        Build a row mask selecting the students in a class.
+
+        Args:
+            _c: Class identifier. If None, all students are selected.
 
-        # Filter out invalid students if include_invalid is False
-        if not include_invalid:
-            students = [s for s in students if s not in invalid_students]
-        return Ok(students)
+        Returns:
+            np.ndarray: Boolean mask over the roster rows
+        """
+        if _c is None:
+            return np.ones(len(self._roster), dtype=bool)
+        return self._roster.classes == _c
 
     def get_marks_for_task(self, task: int, _c: int | None = None, include_none: bool = False) -> Result:
         """
@@ -99,15 +293,62 @@ class DB:
         Returns:
             Result[List[int], str]: List of marks for the specified task if found, Error message if not found
         """
-        if not self._objects:
-            return Err("No students found")
+        with self._lock:
+            if not len(self._roster):
+                return Err("No students found")
+
+            mask = self._class_mask(_c)
+            missing = self._roster.missing[mask, task - 1]
+            marks = self._roster.marks[mask, task - 1]
+            if include_none:
+                marks = [None if m else v for v, m in zip(marks.tolist(), missing.tolist())]
+            else:
+                marks = marks[~missing].tolist()
+            if not marks:
+                return Err(f"No marks found for Task {task}")
+
+            return Ok(marks)
+
+    def get_complete_epa_marks(self, task: int, _c: int | None = None) -> Result:
+        """
+        Retrieve the EPA scores and marks for a task of every student that has all of their marks.
 
-        marks = [o.get_task(task) for o in self._objects if (o.get_class() == _c or _c is None)
-                 and (o.get_task(task) is not None or include_none)]
-        if not marks:
-            return Err(f"No marks found for Task {task}")
+        The arrays are read-only copies, kept until the marks change, so predictions against the same
+        version of the roster share them and can use them without holding the lock.
 
-        return Ok(marks)
+        Args:
+            task: Task number (1-4)
+            _c: Optional class identifier to filter students by class. If None, all classes are included.
+
+        Returns:
+            Result[tuple[np.ndarray, np.ndarray], str]: EPA scores and matching marks, Error message if none found
+        """
+        with self._lock:
+            if self._epa_groups_version != self._marks_version:
+                self._epa_groups.clear()
+                self._epa_groups_version = self._marks_version
+
+            group = self._epa_groups.get((task, _c))
+            if group is None:
+                mask = self._class_mask(_c) & self._complete_mask()
+                if not mask.any():
+                    return Err(f"No complete students found for Task {task}")
+                group = (self._roster.epas[mask], self._roster.marks[mask, task - 1])
+                for column in group:
+                    column.flags.writeable = False
+                self._epa_groups.put((task, _c), group)
+            return Ok(group)
+
+    def _complete_mask(self) -> np.ndarray:
+        """
+        Get a row mask selecting the students that have all of their marks, kept until the marks change.
+
+        Returns:
+            np.ndarray: Boolean mask over the roster rows
+        """
+        if self._complete is None or self._complete[0] != self._marks_version:
+            self._complete = (self._marks_version, ~self._roster.missing.any(axis=1))
+        return self._complete[1]
 
     def get_with_id(self, _id: int) -> Result:
         """
@@ -119,9 +360,10 @@ class DB:
         Returns:
             Result[Student, str]: Student object if found, Error message if not found
         """
-        for o in self._objects:
-            if o.get_id() == _id:
-                return Ok(deepcopy(o))
+        with self._lock:
+            pos = self._roster.position(_id)
+            if pos is not None:
+                return Ok(self._roster.student_at(pos))
         return Err(f"{_id} not found")
 
     def get_all_with_missing_tasks(self) -> Result:
@@ -131,62 +373,563 @@ class DB:
         Returns:
             Result[List[Student], str]: List of Student objects with missing tasks if found, Error message if not found
         """
-        if not self._objects:
-            return Err("No students found")
+        with self._lock:
+            if not len(self._roster):
+                return Err("No students found")
+
+            positions = np.flatnonzero(self._roster.missing.any(axis=1))
+            if not len(positions):
+                return Err("No students with missing tasks found")
+
+            return Ok(self._roster.students_at(positions))
+
+    def get_ids(self, complete_only: bool = False) -> np.ndarray:
+        """
+        Get the IDs of the students.
+
+        Args:
+            complete_only: Only include the students that have all of their marks
+
+        Returns:
+            np.ndarray: Sorted student IDs
+        """
+        with self._lock:
+            ids = self._roster.ids
+            if complete_only:
+                ids = ids[~self._roster.missing.any(axis=1)]
+            return np.sort(ids)
+
+    def get_columns(self, _c: int | None = None, missing_only: bool = False) -> Result:
+        """
+        Get students as a columnar JSON payload, see `encode_columns`, sorted by ID.
+
+        Args:
+            _c: Optional class identifier to filter students by class. If None, all classes are included.
+            missing_only: Whether to only include students with missing tasks
+
+        Returns:
+            Result[bytes, str]: The encoded payload, which may contain no students
+        """
+        with self._lock:
+            mask = self._class_mask(_c)
+            if missing_only:
+                mask &= self._roster.missing.any(axis=1)
+            positions = np.flatnonzero(mask)
+            positions = positions[np.argsort(self._roster.ids[positions], kind="stable")]
+            return Ok(encode_columns(self._roster, positions))
+
+    def get_version(self) -> int:
+        """
+        Get the version of the data. It increases with every change, and is never reused, even by another DB.
+
+        Returns:
+            int: The current data version
+        """
+        return self._version
+
+    def get_marks_version(self) -> int:
+        """
+        Get the version of the data that predictions depend on: the marks, EPA scores and classes.
+        Unlike `get_version`, it doesn't change when only a name changes.
+
+        Returns:
+            int: The data version of the last change to the marks, EPA scores or classes
+        """
+        return self._marks_version
+
+    def _changed_since(self, version: int) -> tuple[bool, np.ndarray]:
+        """
+        Find the rows changed after a data version.
+
+        Args:
+            version: A version returned by `get_version`
+
+        Returns:
+            tuple[bool, np.ndarray]: Whether every row is included because the data was reloaded since the
+                version, and the row positions sorted by ID
+        """
+        if version < self._reset_version:
+            positions = np.arange(len(self._roster))
+            full = True
+        else:
+            positions = np.flatnonzero(self._row_versions[:len(self._roster)] > version)
+            full = False
+        return full, positions[np.argsort(self._roster.ids[positions], kind="stable")]
+
+    def get_students_since(self, version: int) -> Result:
+        """
+        Get the students added or changed after a data version.
+
+        If the roster was (re)loaded since, e.g. because the file changed on disk, students may also have
+        been removed, so every student is returned and flagged as a full resync.
+
+        Args:
+            version: A version returned by `get_version`, 0 to get every student
+
+        Returns:
+            Result[tuple[int, bool, List[Student]], str]: The current version, whether this is a full resync,
+                and the students
+        """
+        with self._lock:
+            full, positions = self._changed_since(version)
+            return Ok((self._version, full, self._roster.students_at(positions)))
+
+    def get_columns_since(self, version: int) -> Result:
+        """
+        Get the students added or changed after a data version as a columnar JSON payload, see
+        `get_students_since` and `encode_columns`. The payload also has the current "version" and a "full" flag.
+
+        Args:
+            version: A version returned by `get_version`, 0 to get every student
+
+        Returns:
+            Result[bytes, str]: The encoded payload
+        """
+        with self._lock:
+            full, positions = self._changed_since(version)
+            return Ok(encode_columns(self._roster, positions, version=self._version, full=full))
+
+    def query_students(self, offset: int = 0, limit: int = 20, sort: str = "id", descending: bool = False,
+                       _c: int | None = None, missing: bool | None = None, search: str | None = None) -> Result:
+        """
+        Get one page of students, filtered and sorted on the roster columns.
+        Only the students on the page are turned into Student objects.
+
+        Args:
+            offset: Number of matching students to skip
+            limit: Maximum number of students to return
+            sort: Column to sort by, one of `SORT_KEYS`. Ties are ordered by ID, in the same direction.
+            descending: Whether to sort from highest to lowest
+            _c: Optional class identifier to filter students by class. If None, all classes are included.
+            missing: If True only students with missing tasks are included, if False only those without.
+                If None, both are included.
+            search: Optional case-insensitive text the student's name must contain
+
+        Returns:
+            Result[tuple[int, List[Student]], str]: Number of matching students and the students on the page,
+                Error message if the sort key is unknown
+        """
+        if sort not in SORT_KEYS:
+            return Err(f"Unknown sort key {sort}")
+
+        with self._lock:
+            roster = self._roster
+            mask = self._class_mask(_c)
+            if missing is not None:
+                mask &= roster.missing.any(axis=1) == missing
+            if search:
+                query = search.lower()
+                names = self._lowercase_names()
+                mask &= np.fromiter((query in n for n in names), dtype=bool, count=len(names))
 
-        missing_tasks = [s for s in self._objects if any(t is None for t in s.get_all_tasks())]
-        if not missing_tasks:
-            return Err("No students with missing tasks found")
+            positions = np.flatnonzero(mask)
+            if sort == "name":
+                key = self._lowercase_names()[positions]
+            elif sort == "average":
+                # Students without any marks sort last
+                key = np.nan_to_num(roster.averages()[positions], nan=-np.inf if descending else np.inf)
+            else:
+                key = getattr(roster, SORT_KEYS[sort])[positions]
+            order = np.lexsort((roster.ids[positions], key))
+            if descending:
+                order = order[::-1]
 
-        return Ok(missing_tasks)
+            page = positions[order[max(offset, 0):max(offset, 0) + max(limit, 0)]]
+            return Ok((len(positions), roster.students_at(page)))
+
+    def _lowercase_names(self) -> np.ndarray:
+        """
+        Get the lowercase name of every student, for searching and sorting. Built on first use and kept up
+        to date by `_upsert` afterwards.
+
+        Returns:
+            np.ndarray: Lowercase names per roster row
+        """
+        if self._folded_names is None:
+            self._folded_names = np.array([str(n).lower() for n in self._roster.names.tolist()], dtype=object)
+        return self._folded_names
 
     def update_df(self):
         """
         Update DataFrame from current Student objects and save to CSV.
 
         This method synchronizes the DataFrame with the current state of Student objects
-        and persists the changes to disk.
+        and persists the changes to disk. The CSV is written to a temporary file that then replaces
+        the original, so a crash mid-write never leaves a truncated roster. Only a copy of the roster is
+        taken under the lock, edits can continue while it is converted and written. The sidecar cache,
+        if enabled, is written from the same copy. Databases without a file, see `from_roster`, are never
+        saved.
+        """
+        if not self._path:
+            return
+
+        with self._save_lock:
+            with self._lock:
+                if not len(self._roster):
+                    return
+
+                # Copy the rows sorted by ID, as they are when the CSV is parsed
+                snapshot = self._roster.select(np.argsort(self._roster.ids, kind="stable"))
+                version = self._version
+
+                # Edits made from here on go to a fresh journal
+                if self._journal is not None:
+                    self._journal.rotate()
+
+            frame = snapshot.to_frame()
+            tmp = write_temp_file(self._path, lambda f: frame.to_csv(f, index=False))
+
+            with self._lock:
+                os.replace(tmp, self._path)
+                self._stamp = stamp = self._stat()
+                if self._version == version:
+                    self._frame = frame
+
+                # Every journaled edit up to the snapshot is now in the CSV
+                if self._journal is not None:
+                    self._journal.discard_rotated()
+
+            if self._sidecar:
+                save_sidecar(self._path, stamp, snapshot)
+
+    def flush(self) -> None:
         """
-        if not self._objects:
+        Wait until every saved edit has been written back into the CSV, compacting the journal now if it
+        has any entries.
+        """
+        if self._saver is None:
             return
+        if len(self._journal):
+            self._saver.schedule()
+        self._saver.flush()
 
-        # Convert Student objects back to dictionary format
-        data = [
-            {
-                "id": student.get_id(),
-                "Student": student.get_name(),
-                "Class": student.get_class(),
-                "EPA Score": student.get_epa(),
-                "Task 1": student.get_task(1),
-                "Task 2": student.get_task(2),
-                "Task 3": student.get_task(3),
-                "Task 4": student.get_task(4)
-            }
-            for student in self._objects
-        ]
-
-        # Create new DataFrame and sort by ID
-        self._file = pd.DataFrame(data).sort_values("id")
-        pd.DataFrame(self._file).to_csv(self._path, index=False)
+    def close(self) -> None:
+        """
+        Write any journaled edits back into the CSV, stop the background saver and close the journal.
+        """
+        if self._journal is None:
+            return
+        if len(self._journal):
+            self._saver.schedule()
+        self._saver.close()
+        self._journal.close()
 
     def update_student(self, student: Student, save=True) -> None:
         """
         Update student record in memory and optionally persist to file.
         If the student does not exist, add them.
 
+        Saved changes are appended to the journal straight away. The CSV is only rewritten once the journal
+        holds `JOURNAL_COMPACT_THRESHOLD` edits, in the background after edits stop for `SAVE_DELAY`
+        seconds, and when the database is flushed or closed.
+
         Args:
             student: Updated Student object
             save: Whether to save changes to CSV file
 
         """
-        old = next((i for i, obj in enumerate(self._objects) if obj.get_id() == student.get_id()), None)
+        with self._lock:
+            old = self._roster.position(student.get_id())
+            previous = self._roster.student_at(old) if old is not None and save else None
+            self._upsert(student)
+            if not save:
+                return
+
+            if self._journal is None:
+                self.update_df()
+                return
+
+            self._record(previous, student)
+            if len(self._journal) < JOURNAL_COMPACT_THRESHOLD:
+                return
+        self._saver.schedule()
+
+    def set_mark(self, _id: int, task: int, mark: int | None, save=True) -> Result:
+        """
+        Change one mark of a stored student. The student is read and stored under the lock, so concurrent
+        edits of the same student's other marks are never lost.
+
+        Args:
+            _id: Student identifier
+            task: Task number (1-4)
+            mark: The new mark, None to clear it
+            save: Whether to save changes to CSV file
+
+        Returns:
+            Result[Student, str]: The updated student, Error message if the student isn't found
+        """
+        with self._lock:
+            result = self.get_with_id(_id)
+            if result.is_err():
+                return result
+            student = result.unwrap().with_mark(task, mark)
+            self.update_student(student, save)
+        return Ok(student)
+
+    def add_student(self, student: Student, save=True) -> int:
+        """
+        Store a new student under the next available ID, see `get_next_id`, whatever ID the given student has.
+        The ID is picked under the lock, so students added concurrently never share one.
+
+        Args:
+            student: Student to add
+            save: Whether to save changes to CSV file
+
+        Returns:
+            int: The new student's ID
+        """
+        with self._lock:
+            _id = self.get_next_id()
+            self.update_student(Student(_id, student.get_name(), student.get_class(), student.get_epa(),
+                                        student.get_all_tasks()), save)
+        return _id
+
+    def _upsert(self, student: Student) -> None:
+        """
+        Store a student in the roster and the built indexes, replacing the stored student with the same ID.
+
+        Args:
+            student: Student to store
+        """
+        self._frame = None
+        old = self._roster.position(student.get_id())
         if old is None:
-            self._objects.append(deepcopy(student))
+            pos = self._roster.append(student)
+            marks_changed = True
+            # Every rank column needs a new row, rebuild them when next used
+            self._rank_columns = [None] * self._roster.tasks
         else:
-            self._objects[old] = deepcopy(student)
-        self._file = pd.DataFrame(self._objects)
-        if save:
-            self.update_df()
+            stored = self._roster.student_at(old)
+            marks_changed = (tuple(stored.get_all_tasks()) != tuple(student.get_all_tasks())
+                             or stored.get_epa() != student.get_epa()
+                             or stored.get_class() != student.get_class())
+            self._update_indexes(old, add=False)
+            self._roster.set_row(old, student)
+            pos = old
+            self._update_rank_columns(pos, stored.get_all_tasks())
+        self._update_indexes(pos, add=True)
+
+        self._version = next(_versions)
+        if marks_changed:
+            self._marks_version = self._version
+        if pos >= len(self._row_versions):
+            self._row_versions = np.concatenate([self._row_versions, np.zeros(max(8, pos + 1), dtype=np.int64)])
+        self._row_versions[pos] = self._version
+
+        if self._folded_names is not None:
+            name = student.get_name().lower()
+            if pos < len(self._folded_names):
+                self._folded_names[pos] = name
+            else:
+                self._folded_names = np.append(self._folded_names, name)
+
+    def _record(self, previous: Student | None, student: Student) -> None:
+        """
+        Append an edit to the journal, as a single mark if that's all that changed.
+
+        Args:
+            previous: The stored student before the edit, None if it's a new student
+            student: The stored student after the edit
+        """
+        if previous is not None and (
+                previous.get_name() == student.get_name()
+                and previous.get_class() == student.get_class()
+                and previous.get_epa() == student.get_epa()):
+            changed = [t for t in range(1, self._roster.tasks + 1) if previous.get_task(t) != student.get_task(t)]
+            if not changed:
+                return
+            if len(changed) == 1:
+                self._journal.append_mark(student.get_id(), changed[0], student.get_task(changed[0]))
+                return
+        self._journal.append_student(student)
+
+    def _task_index(self, task: int) -> SortedIndex:
+        """
+        Get the sorted index of the recorded marks for a task, building it on first use. The index is built
+        under the lock, so it can't miss or repeat a row being stored by `_upsert`.
+
+        Args:
+            task: Task number (1-4)
+
+        Returns:
+            SortedIndex: The recorded marks for the task
+        """
+        with self._lock:
+            index = self._task_indexes[task - 1]
+            if index is None:
+                index = SortedIndex(self._roster.marks[~self._roster.missing[:, task - 1], task - 1])
+                self._task_indexes[task - 1] = index
+            return index
+
+    def _average_index(self) -> SortedIndex:
+        """
+        Get the sorted index of every student's average mark, building it on first use.
+        Students without any marks are left out.
+
+        Returns:
+            SortedIndex: The average marks
+        """
+        with self._lock:
+            if self._avg_index is None:
+                averages = self._roster.averages()
+                self._avg_index = SortedIndex(averages[~np.isnan(averages)])
+            return self._avg_index
+
+    def _update_indexes(self, pos: int, add: bool) -> None:
+        """
+        Add or remove the marks of a roster row from the indexes that have been built.
+
+        Args:
+            pos: Row position
+            add: True to add the row's marks, False to remove them
+        """
+        marks = self._roster.marks[pos].tolist()
+        missing = self._roster.missing[pos].tolist()
+        for index, mark, is_missing in zip(self._task_indexes, marks, missing):
+            if index is None or is_missing:
+                continue
+            if add:
+                index.add(mark)
+            else:
+                index.remove(mark)
+
+        average = self._roster.average_at(pos)
+        if self._avg_index is not None and average is not None:
+            if add:
+                self._avg_index.add(average)
+            else:
+                self._avg_index.remove(average)
+
+    def _rank_column(self, task: int) -> np.ndarray:
+        """
+        Get the rank of every student on a task, building it on first use, see `get_rank_matrix`.
+
+        Args:
+            task: Task number (1-4)
+
+        Returns:
+            np.ndarray: Rank per roster row, NaN for students missing the mark
+        """
+        with self._lock:
+            column = self._rank_columns[task - 1]
+            if column is None:
+                column = self._roster.ranks(task)
+                self._rank_columns[task - 1] = column
+            return column
+
+    def _update_rank_columns(self, pos: int, previous: tuple) -> None:
+        """
+        Update the rank columns that have been built after the marks of a roster row changed.
+
+        A student's rank is one more than the number of higher marks, so moving a mark from a to b only
+        changes the ranks of the marks in between, by one. The row itself is ranked again.
+
+        Args:
+            pos: Row position
+            previous: The row's marks before the change, None where missing
+        """
+        for t, column in enumerate(self._rank_columns):
+            if column is None:
+                continue
+            before = previous[t]
+            after = None if self._roster.missing[pos, t] else int(self._roster.marks[pos, t])
+            if before == after:
+                continue
+
+            marks = self._roster.marks[:, t]
+            # Rows missing the mark stay NaN
+            if after is not None:
+                column += marks < after
+            if before is not None:
+                column -= marks < before
+            if after is None:
+                column[pos] = np.nan
+            else:
+                column[pos] = np.count_nonzero((marks > after) & ~self._roster.missing[:, t]) + 1
+
+    def get_rank_matrix(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the rank of every student on every task. Ranks match `get_student_rank_task`: the highest mark
+        ranks first and tied marks share the best rank.
+
+        Each task is ranked with a single sort when first needed, and kept up to date as marks change.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Student IDs, and an N×T matrix of ranks for those students with
+            NaN for missing marks
+        """
+        with self._lock:
+            return self._roster.ids.copy(), np.column_stack([self._rank_column(t) for t in range(1, self._roster.tasks + 1)])
+
+    def get_ranked_marks(self, task: int) -> Result:
+        """
+        Retrieve the rank and mark of every student with a mark for a task.
+
+        Args:
+            task: Task number (1-4)
+
+        Returns:
+            Result[tuple[np.ndarray, np.ndarray], str]: Ranks and matching marks, Error message if none found
+        """
+        with self._lock:
+            present = ~self._roster.missing[:, task - 1]
+            if not present.any():
+                return Err(f"No marks found for Task {task}")
+            return Ok((self._rank_column(task)[present], self._roster.marks[present, task - 1]))
+
+    def get_student_ranks(self, student: Student) -> list[int | None]:
+        """
+        Calculate a student's rank on every task, see `get_student_rank_task`.
+
+        The ranks of a stored student whose marks haven't changed are read from the rank matrix.
+
+        Args:
+            student (Student): Student object
+
+        Returns:
+            list[int | None]: Rank per task, None where the student doesn't have a mark
+        """
+        with self._lock:
+            pos = self._roster.position(student.get_id())
+            ranks = []
+            for task, mark in enumerate(student.get_all_tasks(), start=1):
+                if mark is None:
+                    ranks.append(None)
+                elif pos is not None and not self._roster.missing[pos, task - 1] and self._roster.marks[pos, task - 1] == mark:
+                    ranks.append(int(self._rank_column(task)[pos]))
+                else:
+                    ranks.append(self._task_index(task).rank(mark))
+            return ranks
+
+    def count_marks(self, task: int) -> int:
+        """
+        Count the students with a mark for a task.
+
+        Args:
+            task: Task number (1-4)
+
+        Returns:
+            int: Number of recorded marks
+        """
+        with self._lock:
+            return len(self._task_index(task))
+
+    def get_nth_best_mark(self, task: int, n: int) -> Result:
+        """
+        Get the mark of the n-th best student on a task, counting tied marks separately.
+
+        Args:
+            task: Task number (1-4)
+            n: 1-based position from the top
+
+        Returns:
+            Result[int, str]: The mark, Error message if there are fewer than n marks
+        """
+        with self._lock:
+            try:
+                return Ok(self._task_index(task).nth_largest(n))
+            except IndexError as e:
+                return Err(str(e))
 
     def student_exists(self, student: Student) -> bool:
         """
@@ -198,12 +941,16 @@ class DB:
         Returns:
             bool: True if student exists, False otherwise
         """
-        return any(o.get_id() == student.get_id() for o in self._objects)
+        with self._lock:
+            return self._roster.position(student.get_id()) is not None
 
     def get_student_rank_avg(self, student: Student) -> int:
         """
         Calculate student rank for average mark
 
+        The student is compared against every other stored student, so it doesn't need to be in the
+        database and its marks may differ from the stored ones.
+
         Args:
             student (Student): Student object
 
@@ -213,16 +960,26 @@ class DB:
 
         import math
 
-        list_avg = [x for x in self._objects if x.get_id() != student.get_id()]
-        list_avg.sort(key=lambda o: o.calc_average())
+        with self._lock:
+            index = self._average_index()
+            avg = student.calc_average()
+
+            # Number of other students ranked below, i.e. the position of the first average >= avg once sorted
+            i = index.count_below(avg)
+            others = len(index)
 
-        avg = student.calc_average()
+            # Leave out the stored copy of the student
+            pos = self._roster.position(student.get_id())
+            stored = self._roster.average_at(pos) if pos is not None else None
+            if stored is not None:
+                others -= 1
+                if stored < avg:
+                    i -= 1
 
-        for i, s in enumerate(list_avg):
-            if s.calc_average() >= avg:
+            if i < others:
                 return math.ceil(len(self) - i)
 
-        return 1
+            return 1
 
     def get_lowest_rank_task(self, task: int) -> Result:
         """
@@ -234,21 +991,25 @@ class DB:
         Returns:
             Result[float, str]: Lowest rank for the specified task if found, Error message if not found
         """
-        marks = [x.get_task(task) for x in self._objects]
-        if not marks:
-            return Err(f"No marks found for Task {task}")
+        with self._lock:
+            marks = self._roster.marks[~self._roster.missing[:, task - 1], task - 1]
+            if not len(marks):
+                return Err(f"No marks found for Task {task}")
 
-        sorted_marks = sorted(set(marks), reverse=True)
-        if not sorted_marks:
-            return Err(f"No unique marks found for Task {task}")
+            sorted_marks = np.unique(marks)
+            if not len(sorted_marks):
+                return Err(f"No unique marks found for Task {task}")
 
-        lowest_rank = len(sorted_marks)
-        return Ok(lowest_rank)
+            lowest_rank = len(sorted_marks)
+            return Ok(lowest_rank)
 
     def get_student_rank_task(self, student: Student, task: int) -> Result:
         """
         Calculate student rank on a specific task
 
+        Tied marks share the best rank, and a mark that no stored student has ranks where it would be
+        inserted. The student doesn't need to be in the database.
+
         Args:
             student (Student): Student object
             task (int): Task number
@@ -262,19 +1023,9 @@ class DB:
 
         if student_mark is None: return Err(f"Student doesn't have a mark for task {task}")
 
-        # Get all marks for the task, including the student's
-        marks = [x.get_task(task) for x in self._objects]
-        # Sort in descending order (higher marks = better rank)
-        sorted_marks = sorted(marks, reverse=True)
-
-        # Rank is 1-based index in sorted unique marks
-        try:
-            rank = sorted_marks.index(student_mark) + 1
-        except ValueError:
-            marks.append(student_mark)
-            sorted_marks = sorted(set(marks), reverse=True)
-            rank = sorted_marks.index(student_mark) + 1
-        return Ok(rank)
+        # Rank is 1-based, higher marks = better rank
+        with self._lock:
+            return Ok(self._task_index(task).rank(student_mark))
 
     def get_next_id(self) -> int:
         """
@@ -283,6 +1034,7 @@ class DB:
         Returns:
             int: The next available student ID (max existing ID + 1, or 1 if no students exist)
         """
-        if not self._objects:
-            return 1
-        return max(o.get_id() for o in self._objects) + 1
\ No newline at end of file
+        with self._lock:
+            if self._roster.max_id is None:
+                return 1
+            return self._roster.max_id + 1
\ No newline at end of file
@@ -0,0 +1,252 @@
+"""
+Prediction accuracy evaluation for `calculate_mark`.
+
+Every mark of every student with complete marks is hidden in turn and predicted, and the predictions are
+scored against the real marks. Two modes are supported:
+
+    task    Leave one task out. Each mark is cleared in a copy of the roster and predicted against it, so
+            the roster holds no more than the app has when it predicts a missing mark.
+    kfold   The students are split into folds, and each fold is predicted against a roster of the others,
+            so no prediction can see the student's own marks.
+
+Students are handed out to a pool of processes mapping the roster from shared memory, like `impute_missing`.
+"""
+
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from lib.src.processes.db import DB
+from lib.src.processes.ml import calculate_mark
+from lib.src.processes.regression import smape_batch
+from lib.src.processes.shared_roster import shared_pool
+from lib.src.processes.tracing import Tracer
+from lib.src.processes.utils import Result, Ok, Err
+from lib.src.struct.roster import Roster
+
+MODES = ["task", "kfold"]
+
+
+class EvaluationReport(NamedTuple):
+    """
+    Scores of an evaluation run. `by_branch` and `by_task` hold the same scores (predictions, smape, mae)
+    for the predictions made by each decision branch of `calculate_mark` and for each task.
+    """
+    mode: str
+    predictions: int
+    failures: int
+    smape: float
+    mae: float
+    r2: float
+    by_branch: dict[str, dict[str, float]]
+    by_task: dict[int, dict[str, float]]
+    errors: dict[str, int]
+
+
+def evaluate(db: DB, mode: str = "task", folds: int = 5, students: int | None = None, seed: int = 42,
+             workers: int | None = None, chunk_size: int = 64, **thresholds) -> Result:
+    """
+    Measure how accurately `calculate_mark` predicts every mark of the students with complete marks.
+
+    The results don't depend on the number of workers or the order they finish in.
+
+    Args:
+        db: DB instance containing student data.
+        mode: One of `MODES`
+        folds: Number of folds in "kfold" mode
+        students: Number of students to evaluate, picked at random. If None, every student with complete marks.
+        seed: Random seed for picking the students and splitting the folds
+        workers: Number of processes. If None, one per CPU.
+        chunk_size: Number of students per unit of work.
+        **thresholds: Thresholds passed to `calculate_mark`, e.g. trend_threshold=15
+
+    Returns:
+        Result (OK): EvaluationReport
+        Result (Err): An error message if the mode is unknown or there are no students to evaluate.
+    """
+    if mode not in MODES:
+        return Err(f"Unknown evaluation mode {mode!r}, expected one of {MODES}")
+
+    ids = db.get_ids(complete_only=True)
+    rng = np.random.default_rng(seed)
+    if students is not None and students < len(ids):
+        ids = np.sort(rng.choice(ids, students, replace=False))
+    if not len(ids):
+        return Err("No students with complete marks to evaluate.")
+
+    # Fold of every stored student, -1 when predicting against the whole roster
+    all_ids = db.get_ids()
+    fold_of = rng.integers(0, folds, len(all_ids)) if mode == "kfold" else np.full(len(all_ids), -1)
+    student_folds = fold_of[np.searchsorted(all_ids, ids)]
+
+    # Units of work never mix folds, and are ordered by fold so each worker builds few fold rosters
+    units = []
+    for fold in np.unique(student_folds):
+        fold_ids = ids[student_folds == fold].tolist()
+        units += [(int(fold), fold_ids[i:i + chunk_size]) for i in range(0, len(fold_ids), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(units))
+
+    if workers <= 1:
+        folds_db = _FoldDBs(db, all_ids, fold_of)
+        results = [r for fold, unit in units for r in _evaluate_students(db, folds_db.get(fold), unit, thresholds)]
+    else:
+        with shared_pool(db.share(), workers, _init_evaluate_worker, (all_ids, fold_of, thresholds)) as pool:
+            results = [r for chunk in pool.map(_evaluate_unit, units) for r in chunk]
+
+    results.sort(key=lambda r: (r[0], r[1]))
+    return Ok(_report(mode, results))
+
+
+class _FoldDBs:
+    """
+    Databases to predict each fold against, keeping only the most recent one as units arrive fold by fold.
+    Each is a copy, as marks are hidden in it while they are predicted, see `_evaluate_students`.
+    """
+
+    def __init__(self, db: DB, ids: np.ndarray, fold_of: np.ndarray):
+        """
+        Args:
+            db: DB instance containing every student
+            ids: Sorted IDs of every student
+            fold_of: Fold of each student in ids
+        """
+        self._db = db
+        self._ids = ids
+        self._fold_of = fold_of
+        self._fold: int | None = None
+        self._fold_db: DB | None = None
+
+    def get(self, fold: int) -> DB:
+        if fold != self._fold:
+            self._fold = fold
+            self._fold_db = self._db.subset(self._ids if fold < 0 else self._ids[self._fold_of != fold])
+        return self._fold_db
+
+
+# Databases of each `evaluate` worker over the shared roster
+_worker_db: DB | None = None
+_worker_folds: _FoldDBs | None = None
+_worker_thresholds: dict = {}
+
+
+def _init_evaluate_worker(roster: Roster, ids: np.ndarray, fold_of: np.ndarray, thresholds: dict) -> None:
+    global _worker_db, _worker_folds, _worker_thresholds
+    _worker_db = DB.from_roster(roster)
+    _worker_folds = _FoldDBs(_worker_db, ids, fold_of)
+    _worker_thresholds = thresholds
+
+
+def _evaluate_unit(unit: tuple[int, list[int]]) -> list[tuple]:
+    fold, ids = unit
+    return _evaluate_students(_worker_db, _worker_folds.get(fold), ids, _worker_thresholds)
+
+
+def _evaluate_students(db: DB, against: DB, ids: list[int], thresholds: dict) -> list[tuple]:
+    """
+    Hide and predict every mark of some students. The branches are recorded with a tracer of their own,
+    so the traces collected by the app's `tracer` are left alone.
+
+    A student stored in `against` has the mark cleared there too until it is predicted, so it can't
+    feed the regressions and ranks the prediction is based on.
+
+    Args:
+        db: DB instance the students are read from.
+        against: DB instance the marks are predicted against. Changed while predicting, but left as it was.
+        ids: IDs of the students.
+        thresholds: Thresholds passed to `calculate_mark`
+
+    Returns:
+        list[tuple]: Student ID, task ID, real mark, predicted mark (None if it failed) and the branch or error,
+        per mark
+    """
+    traces = Tracer(maxlen=1)
+    traces.enabled = True
+    results = []
+    for _id in ids:
+        student = db.get_with_id(_id).unwrap()
+        stored = against.student_exists(student)
+        for task_id, mark in enumerate(student.get_all_tasks(), start=1):
+            hidden = student.with_mark(task_id, None)
+            if stored:
+                against.update_student(hidden, save=False)
+            try:
+                result = calculate_mark(against, hidden, task_id, trace_with=traces, **thresholds)
+            except Exception as e:
+                result = Err(f"Error calculating mark: {e}")
+            finally:
+                if stored:
+                    against.update_student(student, save=False)
+            if result.is_ok():
+                results.append((_id, task_id, mark, int(result.unwrap()), traces.last().branch))
+            else:
+                results.append((_id, task_id, mark, None, str(result.unwrap_err())))
+    return results
+
+
+def _scores(actual: np.ndarray, predicted: np.ndarray) -> dict[str, float]:
+    if not len(actual):
+        return {"predictions": 0, "smape": float("nan"), "mae": float("nan")}
+    return {
+        "predictions": len(actual),
+        "smape": float(smape_batch(actual, predicted).mean()),
+        "mae": float(np.abs(actual - predicted).mean()),
+    }
+
+
+def _report(mode: str, results: list[tuple]) -> EvaluationReport:
+    """
+    Score the results of `_evaluate_students`.
+    """
+    ok = [r for r in results if r[3] is not None]
+    errors = {}
+    for r in results:
+        if r[3] is None:
+            errors[r[4]] = errors.get(r[4], 0) + 1
+
+    tasks = np.array([r[1] for r in ok], dtype=np.int64)
+    actual = np.array([r[2] for r in ok], dtype=np.float64)
+    predicted = np.array([r[3] for r in ok], dtype=np.float64)
+    branches = np.array([r[4] for r in ok], dtype=object)
+
+    ss_tot = ((actual - actual.mean()) ** 2).sum() if len(actual) else 0.0
+    ss_res = ((actual - predicted) ** 2).sum()
+    overall = _scores(actual, predicted)
+
+    return EvaluationReport(
+        mode=mode,
+        predictions=len(ok),
+        failures=len(results) - len(ok),
+        smape=overall["smape"],
+        mae=overall["mae"],
+        r2=float(1 - ss_res / ss_tot) if ss_tot > 0 else float("nan"),
+        by_branch={
+            str(b): _scores(actual[branches == b], predicted[branches == b])
+            for b in sorted(set(branches), key=lambda b: -(branches == b).sum())
+        },
+        by_task={int(t): _scores(actual[tasks == t], predicted[tasks == t]) for t in np.unique(tasks)},
+        errors=dict(sorted(errors.items(), key=lambda e: -e[1])),
+    )
+
+
+def format_report(report: EvaluationReport) -> str:
+    """
+    Format a report as a table for printing.
+
+    Args:
+        report: Result of `evaluate`
+
+    Returns:
+        str: The report
+    """
+    lines = [
+        f"{report.mode} evaluation: {report.predictions:,} predictions, {report.failures:,} failures",
+        f"  SMAPE {report.smape:.2f}%  MAE {report.mae:.2f}  R² {report.r2:.3f}",
+        "  by branch:",
+        *(f"    {b:<16} {s['predictions']:>9,} {s['smape']:8.2f}% {s['mae']:8.2f}" for b, s in report.by_branch.items()),
+        "  by task:",
+        *(f"    Task {t:<11} {s['predictions']:>9,} {s['smape']:8.2f}% {s['mae']:8.2f}" for t, s in report.by_task.items()),
+    ]
+    if report.errors:
+        lines += ["  failures:", *(f"    {n:>9,}  {e}" for e, n in report.errors.items())]
+    return "\n".join(lines)
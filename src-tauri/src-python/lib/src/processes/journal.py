@@ -0,0 +1,163 @@
+import json
+import os
+
+from lib.src.struct.students import Student
+
+
+class Journal:
+    """
+    Append-only log of student edits, stored next to a roster CSV.
+
+    Every edit is written as one JSON line, so recording it costs the same regardless of the roster size.
+    The journal is replayed on top of the CSV when the roster is loaded, and cleared once the edits have
+    been written back into the CSV.
+
+    While the CSV is being rewritten in the background, the journal is rotated: the entries being saved
+    move to `<csv>.journal.old` and new edits start a fresh journal, so edits made during the save
+    aren't lost when it completes. Entries set absolute values, so replaying the old journal again after
+    an interrupted save is harmless.
+
+    Entries are either a single mark:
+        {"op": "mark", "id": 1, "task": 2, "mark": 70}
+    or a whole student:
+        {"op": "student", "id": 1, "name": "...", "class": 3, "epa": 2.5, "tasks": [70, null, 80, 90]}
+    """
+
+    def __init__(self, roster_path: str):
+        """
+        Open the journal for a roster.
+
+        Args:
+            roster_path: File path to the roster CSV
+        """
+        self._path = roster_path + ".journal"
+        self._rotated_path = self._path + ".old"
+        self._file = None
+        self._entries = 0
+
+    def get_path(self) -> str:
+        return self._path
+
+    def __len__(self):
+        """
+        Get the number of entries written since the journal was last cleared.
+        """
+        return self._entries
+
+    def read(self) -> list[dict]:
+        """
+        Read every entry in the journal. A partially written last line, e.g. after a crash, is ignored.
+
+        Returns:
+            list[dict]: The entries, oldest first
+        """
+        entries = []
+        for path in (self._rotated_path, self._path):
+            try:
+                with open(path, "r") as f:
+                    for line in f:
+                        try:
+                            entries.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            break
+            except FileNotFoundError:
+                pass
+        self._entries = len(entries)
+        return entries
+
+    def append_mark(self, _id: int, task: int, mark: int | None) -> None:
+        """
+        Record a change to a single mark.
+
+        Args:
+            _id: Student identifier
+            task: Task number (1-4)
+            mark: The new mark, None if it was cleared
+        """
+        self._write({"op": "mark", "id": int(_id), "task": int(task), "mark": None if mark is None else int(mark)})
+
+    def append_student(self, student: Student) -> None:
+        """
+        Record a new or changed student.
+
+        Args:
+            student: The student as it should be stored
+        """
+        self._write({
+            "op": "student",
+            "id": int(student.get_id()),
+            "name": student.get_name(),
+            "class": int(student.get_class()),
+            "epa": float(student.get_epa()),
+            "tasks": [None if t is None else int(t) for t in student.get_all_tasks()],
+        })
+
+    def _write(self, entry: dict) -> None:
+        if self._file is None:
+            self._file = open(self._path, "a")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        self._entries += 1
+
+    def rotate(self) -> None:
+        """
+        Set the current entries aside while they are written back into the roster CSV.
+        New entries go to a fresh journal. Call `discard_rotated` once the CSV has been written.
+        """
+        self.close()
+        if os.path.exists(self._path):
+            if os.path.exists(self._rotated_path):
+                # A previous save didn't complete, keep its entries ahead of the new ones
+                with open(self._rotated_path, "a") as old, open(self._path, "r") as new:
+                    old.write(new.read())
+                os.remove(self._path)
+            else:
+                os.replace(self._path, self._rotated_path)
+        self._entries = 0
+
+    def discard_rotated(self) -> None:
+        """
+        Remove the entries set aside by `rotate`, once they have been written back into the roster CSV.
+        """
+        try:
+            os.remove(self._rotated_path)
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        """
+        Remove every entry, once they have been written back into the roster CSV.
+        """
+        self.close()
+        for path in (self._path, self._rotated_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self._entries = 0
+
+    def close(self) -> None:
+        """
+        Close the journal file. It is reopened by the next write.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def apply(entry: dict, current: Student | None) -> Student | None:
+        """
+        Apply an entry to a student.
+
+        Args:
+            entry: Journal entry
+            current: The student the entry refers to, None if it isn't stored
+
+        Returns:
+            Student | None: The updated student, None if the entry doesn't apply to anything
+        """
+        if entry["op"] == "student":
+            return Student(entry["id"], entry["name"], entry["class"], entry["epa"], entry["tasks"])
+        if entry["op"] == "mark" and current is not None:
+            return current.with_mark(entry["task"], entry["mark"])
+        return None
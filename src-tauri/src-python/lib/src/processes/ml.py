@@ -1,77 +1,232 @@
+import os
+
 import numpy as np
 import math
 
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
 from lib.src.processes.db import DB
-from lib.src.processes.regression import linear_regression_1d, smape
+from lib.src.processes.shared_roster import shared_pool
+from lib.src.processes.tracing import MarkTrace, Tracer, tracer
+from lib.src.struct.roster import Roster
+from lib.src.processes.regression import linear_regression_1d, linear_regression_batch, smape
 from lib.src.processes.utils import Result, Ok, Err
+from lib.src.struct.lru_cache import LRUCache
 from lib.src.struct.students import Student
 
-def calculate_mark(db: DB, student: Student, task_id: int) -> Result:
+# Maximum number of predictions kept by `calculate_mark_cached`
+PREDICTION_CACHE_SIZE = 4096
+
+prediction_cache = LRUCache(PREDICTION_CACHE_SIZE)
+
+# Thresholds of the decision branches in `calculate_mark`, see `lib.src.processes.evaluation` for tuning them
+# Maximum deviation of the ranks from their mean, as a percentage, for a student to rank consistently
+CONSISTENCY_TOLERANCE = 10
+# Maximum average change in rank per task for a trend to count
+TREND_THRESHOLD = 20
+# Maximum spread between the first and last rank, as a percentage of the students, to use the average rank
+NARROW_SPREAD = 10
+
+
+def calculate_mark_cached(db: DB, student: Student, task_id: int) -> Result:
+    """
+    Calculate the mark for a student like `calculate_mark`, reusing the result of an identical earlier call.
+
+    Predictions depend on the marks, EPA scores and classes of every student, so results are keyed by the
+    database's marks version along with the student's own values. Any change to those makes the earlier
+    results unreachable, and they are evicted as the cache fills up. Renaming a student doesn't.
+    Errors aren't cached.
+
+    Safe to call while other threads edit the students, see `calculate_mark`. A result is only kept if no
+    edit changed the marks version while it was calculated.
+
+    Args:
+        db: DB instance containing student data.
+        student: Student object for whom the mark is to be calculated.
+        task_id: The ID of the task for which the mark is to be calculated.
+
+    Returns:
+        Result: See `calculate_mark`
+    """
+    version = db.get_marks_version()
+    key = (version, student.get_id(), task_id, tuple(student.get_all_tasks()), student.get_epa(), student.get_class())
+    mark = prediction_cache.get(key)
+    if mark is not None:
+        return Ok(mark)
+
+    result = calculate_mark(db, student, task_id)
+    # Versions only increase, so an unchanged version means the calculation saw that version's data
+    if result.is_ok() and db.get_marks_version() == version:
+        prediction_cache.put(key, result.unwrap())
+    return result
+
+
+def calculate_mark(db: DB, student: Student, task_id: int,
+                   consistency_tolerance: float = CONSISTENCY_TOLERANCE,
+                   trend_threshold: float = TREND_THRESHOLD,
+                   narrow_spread: float = NARROW_SPREAD,
+                   trace_with: Tracer | None = None) -> Result:
     """
     Calculate the mark for a student based on their rank and EPA.
 
+    When tracing is enabled, see `lib.src.processes.tracing`, the decision branch, the intermediate values
+    and the time taken by each stage are recorded.
+
+    Everything read from the database is read under its lock, see `DB.locked`, so the prediction sees a
+    single version of the students even while other threads edit them. The regressions on the EPA scores,
+    which take most of the time on large rosters, run on copies after the lock is released.
+
     Args:
         db: DB instance containing student data.
         student: Student object for whom the mark is to be calculated.
         task_id: The ID of the task for which the mark is to be calculated.
+        consistency_tolerance: See `CONSISTENCY_TOLERANCE`
+        trend_threshold: See `TREND_THRESHOLD`
+        narrow_spread: See `NARROW_SPREAD`
+        trace_with: Tracer to record the calculation with. If None, the process-wide `tracer`.
 
     Returns:
         Result (OK): The calculated mark for the student.
         Result (Err): An error message if the rank is inconsistent or if there are no marks for the task.
 
     """
-    try:
-        ranks = [db.get_student_rank_task(student, t).unwrap() for t in range(1, 5) if t is not task_id]
-    except Exception as e:
-        return Err(f"Error computing ranks: {e}")
+    trace_with = trace_with or tracer
+    trace = trace_with.begin(student.get_id(), task_id)
 
+    _tasks = [t for t in range(1, 5) if t != task_id]
     epa = student.get_epa()
-
-    avg_mark = calculate_mark_on_rank(db, db.get_student_rank_avg(student), task_id).unwrap()
-    regression_rank = int(linear_regression_1d([t for t in range(1, 5) if t is not task_id], ranks,
-                                                                [task_id])[0])
-    regression_mark_rank = np.clip((calculate_mark_on_rank(db, regression_rank, task_id).unwrap_or(-1)), 1, len(db) + 1)
-    regression_mark_epa = calculate_mark_on_epa(db, epa, task_id).unwrap()
-    regression_mark_epa_class = calculate_mark_on_epa(db, epa, task_id, int(student.get_class())).unwrap()
-
-
-    # Print debugging information
-    print(f"Debug Info: Ranks: {ranks}, Avg Mark: {avg_mark},Regression Rank: {regression_rank}, "
-            f"Regression Mark Rank: {regression_mark_rank}, Regression Mark EPA: {regression_mark_epa}, {regression_mark_epa_class}")
-    print(f"EPA: {epa}")
+    with db.locked():
+        student_ranks = db.get_student_ranks(student)
+        ranks = [student_ranks[t - 1] for t in _tasks]
+        if None in ranks:
+            return Err(f"Error computing ranks: Student doesn't have a mark for task {_tasks[ranks.index(None)]}")
+
+        rank_fit = linear_regression_batch(_tasks, ranks, [task_id])
+        if trace:
+            trace.lap("ranks")
+
+        students = len(db)
+        avg_mark = calculate_mark_on_rank(db, db.get_student_rank_avg(student), task_id).unwrap()
+        regression_rank = int(rank_fit.prediction[0])
+        regression_mark_rank = np.clip((calculate_mark_on_rank(db, regression_rank, task_id).unwrap_or(-1)), 1, students + 1)
+        if trace:
+            trace.lap("rank_marks")
+
+        epa_groups = _epa_groups(db, task_id, [None, int(student.get_class())]).unwrap()
+
+    regression_mark_epa, regression_mark_epa_class = _fit_marks_on_epa(epa_groups, epa).unwrap()
+
+    if trace:
+        trace.lap("epa_marks")
+        trace.values.update(
+            ranks=ranks,
+            epa=epa,
+            avg_mark=avg_mark,
+            regression_rank=regression_rank,
+            regression_mark_rank=int(regression_mark_rank),
+            regression_mark_epa=regression_mark_epa,
+            regression_mark_epa_class=regression_mark_epa_class,
+        )
 
     # First check if the students rank is consistent +- 5%
-    if check_consistency_percent(ranks, 10).unwrap():
-        print(3)
-        return Ok(avg_mark)
+    if check_consistency_percent(ranks, consistency_tolerance).unwrap():
+        return _decided(trace_with, trace, "consistent_rank", avg_mark)
     else:
         # Check to see if the rank trend is consistent
-        trend = check_trend(ranks, 20).unwrap()
-        if trend != () and regression_mark_rank != -1:
-            print(4)
-            print(f"Trend: {trend}")
-
-            _tasks = [t for t in range(1, 5) if t is not task_id]
-            y_pred = linear_regression_1d(_tasks, ranks, _tasks)
-            r2 = r2_score(ranks, y_pred)
-            print(f"R2 Score: {r2}")
+        trend = check_trend(ranks, trend_threshold).unwrap()
+        if trace:
+            trace.values.update(trend=trend, r2=float(rank_fit.r2))
 
+        if trend != () and regression_mark_rank != -1:
             # 1 for rank decreasing, -1 for rank increasing (As 1 is the highest rank)
             if (epa <= 3.5 and trend == 1) or (epa >= 1.5 and trend == -1):
-                print(5)
-                return Ok(regression_mark_rank)
+                return _decided(trace_with, trace, "trend_rank", regression_mark_rank)
 
-
-            print(6)
-            return Ok(regression_mark_epa)
+            return _decided(trace_with, trace, "trend_epa", regression_mark_epa)
         else:
-            print(7)
-            if abs(ranks[0] - ranks[-1])/len(db)*100 <= 10:
-                print(8)
-                return Ok(avg_mark)
-            return Ok(regression_mark_epa_class)
+            if abs(ranks[0] - ranks[-1])/students*100 <= narrow_spread:
+                return _decided(trace_with, trace, "narrow_spread", avg_mark)
+            return _decided(trace_with, trace, "class_epa", regression_mark_epa_class)
+
+
+def _decided(trace_with: Tracer, trace: MarkTrace | None, branch: str, mark) -> Result:
+    """
+    Return the mark chosen by a branch of `calculate_mark`, completing its trace if there is one.
+    """
+    if trace:
+        trace.values["mark"] = int(mark)
+        trace_with.finish(trace, branch)
+    return Ok(mark)
+
+
+def impute_missing(db: DB, workers: int | None = None, chunk_size: int = 64) -> Result:
+    """
+    Calculate every missing mark of every student, spreading the students over a pool of processes.
+
+    The roster is copied into shared memory once, which every worker maps instead of receiving a pickled
+    DB. Students are handed out in chunks of `chunk_size`, and the results don't depend on the number of
+    workers or the order they finish in. Small cohorts, or `workers=1`, are calculated in this process.
+
+    Args:
+        db: DB instance containing student data.
+        workers: Number of processes. If None, one per CPU.
+        chunk_size: Number of students per unit of work.
+
+    Returns:
+        Result (OK): dict mapping (student ID, task ID) to the Result of `calculate_mark`, in ID then task order.
+        Result (Err): An error message if no students have missing tasks.
+    """
+    students = db.get_all_with_missing_tasks()
+    if students.is_err():
+        return students
+
+    ids = sorted(s.get_id() for s in students.unwrap())
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+
+    if workers <= 1:
+        results = _impute_students(db, ids)
+    else:
+        with shared_pool(db.share(), workers, _init_impute_worker) as pool:
+            results = [r for chunk in pool.map(_impute_chunk, chunks) for r in chunk]
+
+    return Ok({(_id, task): result for _id, task, result in results})
+
+
+# Database opened by each `impute_missing` worker over the shared roster
+_worker_db: DB | None = None
+
+
+def _init_impute_worker(roster: Roster) -> None:
+    global _worker_db
+    _worker_db = DB.from_roster(roster)
+
+
+def _impute_chunk(ids: list[int]) -> list[tuple[int, int, Result]]:
+    return _impute_students(_worker_db, ids)
+
+
+def _impute_students(db: DB, ids: list[int]) -> list[tuple[int, int, Result]]:
+    """
+    Calculate the missing marks of some students.
+
+    Args:
+        db: DB instance containing student data.
+        ids: IDs of the students.
+
+    Returns:
+        list[tuple[int, int, Result]]: Student ID, task ID and the calculated mark or error, per missing mark
+    """
+    results = []
+    for _id in ids:
+        student = db.get_with_id(_id).unwrap()
+        for task_id, mark in enumerate(student.get_all_tasks(), start=1):
+            if mark is not None:
+                continue
+            try:
+                result = calculate_mark(db, student, task_id)
+            except Exception as e:
+                result = Err(f"Error calculating mark: {e}")
+            results.append((_id, task_id, result))
+    return results
 
 
 def calculate_mark_on_epa(db: DB, epa: float, task_id: int, _c: int | None = None) -> Result:
@@ -88,26 +243,76 @@ def calculate_mark_on_epa(db: DB, epa: float, task_id: int, _c: int | None = Non
         Result (Err): An error message if the EPA is out of bounds or if there are no marks for the task.
 
     """
-    task_marks = db.get_marks_for_task(task_id, _c).unwrap()
-    students = db.get_all(_c, include_invalid=False).unwrap()
+    return calculate_marks_on_epa(db, epa, task_id, [_c]).map(lambda marks: marks[0])
+
 
-    if not task_marks:
-        return Err("No marks found for the specified task.")
+def calculate_marks_on_epa(db: DB, epa: float, task_id: int, classes: list[int | None]) -> Result:
+    """
+    Calculate the marks for a student based on their EPA and task ID, against several groups of students
+    at once. The regressions for every group are fitted in a single batch.
+
+    Args:
+        db: DB instance containing student data.
+        epa: The EPA score of the student.
+        task_id: The ID of the task for which the mark is to be calculated.
+        classes: Class IDs to fit against. None fits against all students.
+    Returns:
+        Result (OK): The calculated marks, one per entry in classes.
+        Result (Err): An error message if the EPA is out of bounds or if there are no marks for the task.
 
+    """
+    groups = _epa_groups(db, task_id, classes)
+    if groups.is_err():
+        return groups
+    return _fit_marks_on_epa(groups.unwrap(), epa)
+
+
+def _epa_groups(db: DB, task_id: int, classes: list[int | None]) -> Result:
+    """
+    Read the EPA scores and marks to fit `calculate_marks_on_epa` against. The arrays are copies, so they can
+    be used after the database lock is released.
+
+    Returns:
+        Result (OK): EPA scores and matching marks, one pair per entry in classes.
+        Result (Err): An error message if a group has no students with every mark.
+    """
+    groups = []
+    with db.locked():
+        for _c in classes:
+            # Every complete student has a mark for the task, so an empty group also covers missing marks
+            group = db.get_complete_epa_marks(task_id, _c)
+            if group.is_err():
+                return Err("No marks found for the specified task.")
+            groups.append(group.unwrap())
+    return Ok(groups)
+
+
+def _fit_marks_on_epa(groups: list[tuple[np.ndarray, np.ndarray]], epa: float) -> Result:
+    """
+    Fit the groups read by `_epa_groups` in a single batch and predict the mark at an EPA score for each.
+    """
     if epa < 0 or epa > 5:
         return Err("EPA must be between 0 and 5.")
 
-    marks = [i.get_task(task_id) for i in students if i.get_task(task_id) is not None]
-    epas = [i.get_epa() for i in students]
+    # Stack the groups into padded rows, masking out the padding
+    width = max(len(epas) for epas, _ in groups)
+    x = np.zeros((len(groups), width))
+    y = np.zeros((len(groups), width))
+    mask = np.zeros((len(groups), width), dtype=bool)
+    for i, (epas, marks) in enumerate(groups):
+        x[i, :len(epas)] = epas
+        y[i, :len(marks)] = marks
+        mask[i, :len(epas)] = True
 
-    predict = linear_regression_1d(epas, marks, [epa])
+    predict = linear_regression_batch(x, y, np.full((len(groups), 1), epa), mask).prediction
 
-    return Ok(int(predict[0]))
+    return Ok([int(p) for p in predict[:, 0]])
 
 
 def calculate_mark_on_rank(db: DB, rank: int, task_id: int) -> Result:
     """
     Calculate the mark for a student based on their rank and task ID.
+    Marks for the first and last ranks, or ranks past the last, come from a regression of rank against mark.
 
     Args:
         db: DB instance containing student data.
@@ -116,30 +321,32 @@ def calculate_mark_on_rank(db: DB, rank: int, task_id: int) -> Result:
 
     Returns:
         Result (OK): The calculated mark for the student at the given rank.
-        Result (Err): An error message if the rank is out of bounds or if there are no marks for the task.
+        Result (Err): An error message if the rank is below 1 or if there are no marks for the task.
 
     """
 
-    task_marks = db.get_marks_for_task(task_id).unwrap()
-    task_sorted_marks = sorted(task_marks, reverse=True)
+    count = db.count_marks(task_id)
+    if not count:
+        return Err(f"No marks found for Task {task_id}")
 
-    if rank < 1 or rank > len(task_marks):
+    if rank < 1:
         return Err("Rank is out of bounds for the number of students.")
 
     # Get the mark for the student at the given rank
     # This is done by finding the highest mark and the lowest mark around this rank and averaging them
-    # First check if the rank is the lowest or highest
+    # First check if the rank is the highest, the lowest or below everyone with a mark
 
-    if rank == 1 or rank == len(task_marks):
-        ranks = [db.get_student_rank_task(student, task_id).unwrap() for student in db.get_all().unwrap()]
+    if rank == 1 or rank >= count:
+        # Fit every student's rank against their mark, from the rank matrix
+        ranks, task_marks = db.get_ranked_marks(task_id).unwrap()
 
         predict = linear_regression_1d(ranks, task_marks, [rank])
         new_mark = predict[0]
 
     else:
         # Get the marks around the rank and calculate the average
-        lower_mark = task_sorted_marks[rank - 2]  # Rank is 1-based, so we need to adjust index
-        upper_mark = task_sorted_marks[rank - 1]
+        lower_mark = db.get_nth_best_mark(task_id, rank - 1).unwrap()
+        upper_mark = db.get_nth_best_mark(task_id, rank).unwrap()
         new_mark = (lower_mark + upper_mark) / 2
 
     return Ok(int(new_mark))
@@ -0,0 +1,48 @@
+"""
+Columnar encoding of students for bulk transfer to the frontend.
+
+Instead of one JSON object per student, each field is sent as one array, with the marks of each task in
+their own array and null where a mark is missing:
+
+    {"ids": [1, 2], "names": ["...", "..."], "class_id": [3, 3], "epa": [2.5, 4.0], "tasks": [[70, null], [80, 65], ...]}
+
+The arrays are converted straight from the roster columns and serialized once, without building or
+validating a model per student.
+"""
+
+import json
+
+import numpy as np
+
+from lib.src.struct.roster import Roster
+
+
+def encode_columns(roster: Roster, positions: np.ndarray, **fields) -> bytes:
+    """
+    Serialize roster rows as a columnar JSON payload.
+
+    Args:
+        roster: The roster to read from
+        positions: Row positions to include, in order
+        **fields: Extra values to include in the payload next to the columns
+
+    Returns:
+        bytes: UTF-8 encoded JSON payload
+    """
+    marks = roster.marks[positions]
+    missing = roster.missing[positions]
+    tasks = []
+    for t in range(roster.tasks):
+        column = marks[:, t].astype(object)
+        column[missing[:, t]] = None
+        tasks.append(column.tolist())
+
+    payload = {
+        "ids": roster.ids[positions].tolist(),
+        "names": [str(n) for n in roster.names[positions].tolist()],
+        "class_id": roster.classes[positions].tolist(),
+        "epa": roster.epas[positions].tolist(),
+        "tasks": tasks,
+        **fields,
+    }
+    return json.dumps(payload, separators=(",", ":")).encode()
@@ -0,0 +1,79 @@
+import os
+import threading
+
+from lib.src.processes.db import DB
+
+
+class DBRegistry:
+    """
+    Process-wide cache of loaded databases, keyed by the resolved file path.
+
+    A cached database is revalidated against the file's modification time and size on every lookup,
+    and only reloaded if the file was changed by someone else. Writes made through `DB.update_df`
+    refresh the cached stamp and journaled edits don't touch the CSV, so our own saves never trigger
+    a reload.
+    """
+
+    def __init__(self):
+        self._dbs: dict[str, DB] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> DB:
+        """
+        Get the database for a file, loading or reloading it if required.
+
+        Args:
+            path: File path to CSV database
+
+        Returns:
+            DB: The shared database instance for the file
+
+        Raises:
+            RuntimeError: If the file can't be loaded
+        """
+        if not path:
+            return DB(path)
+
+        key = os.path.realpath(path)
+        with self._lock:
+            db = self._dbs.get(key)
+            if db is None:
+                db = DB(key, sidecar=True)
+                self._dbs[key] = db
+            elif db.is_stale():
+                try:
+                    db.load().unwrap()
+                except RuntimeError:
+                    # Stop its background saver, which would otherwise keep writing to the path
+                    del self._dbs[key]
+                    db.close()
+                    raise
+            return db
+
+    def close_all(self) -> None:
+        """
+        Close every cached database, writing journaled edits back into the CSV files.
+        """
+        with self._lock:
+            for db in self._dbs.values():
+                db.close()
+            self._dbs.clear()
+
+    def __len__(self):
+        return len(self._dbs)
+
+
+registry = DBRegistry()
+
+
+def get_db(path: str) -> DB:
+    """
+    Get the shared database for a file from the process-wide registry.
+
+    Args:
+        path: File path to CSV database
+
+    Returns:
+        DB: The shared database instance for the file
+    """
+    return registry.get(path)
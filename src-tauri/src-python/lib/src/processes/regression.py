@@ -1,6 +1,64 @@
-from sklearn.linear_model import LinearRegression
+from typing import NamedTuple
+
 import numpy as np
-import matplotlib.pyplot as plt
+
+
+class LinearFit(NamedTuple):
+    """
+    Result of a batch of 1-D least-squares fits. Every field has one entry per problem.
+    """
+    slope: np.ndarray
+    intercept: np.ndarray
+    prediction: np.ndarray
+    r2: np.ndarray
+
+
+def linear_regression_batch(x, y, predict, mask=None) -> LinearFit:
+    """
+    Fit many independent 1-D linear regressions at once using the closed-form least-squares solution.
+
+    Each problem is a row of the stacked arrays. Problems with a different number of points can be
+    fitted together by padding them and masking out the padding.
+
+    Degenerate problems behave like scikit-learn's `LinearRegression` and `r2_score`: when every x is
+    the same the slope is 0 and the intercept is the mean of y, and when every y is the same R² is 1
+    for a perfect fit and 0 otherwise.
+
+    Args:
+        x: Input features, shape (k, m) or (m,)
+        y: Target values, same shape as x
+        predict: Values to predict for each problem, shape (k, p) or (p,)
+        mask: Optional boolean array, same shape as x. Only points where it is True are used.
+
+    Returns:
+        LinearFit: Slopes and intercepts with shape (k,), predictions with shape (k, p) and R² with
+        shape (k,) (scalars and (p,) for 1-D inputs)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    predict = np.asarray(predict, dtype=np.float64)
+    w = np.ones(x.shape) if mask is None else np.asarray(mask, dtype=np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n = w.sum(axis=-1)
+        x_mean = (w * x).sum(axis=-1) / n
+        y_mean = (w * y).sum(axis=-1) / n
+        dx = (x - x_mean[..., None]) * w
+        dy = (y - y_mean[..., None]) * w
+
+        sxx = (dx * dx).sum(axis=-1)
+        sxy = (dx * dy).sum(axis=-1)
+        slope = np.where(sxx > 0, sxy / np.where(sxx > 0, sxx, 1), 0.0)
+        intercept = y_mean - slope * x_mean
+
+        residual = (y - (slope[..., None] * x + intercept[..., None])) * w
+        ss_res = (residual * residual).sum(axis=-1)
+        ss_tot = (dy * dy).sum(axis=-1)
+        r2 = np.where(ss_tot > 0, 1 - ss_res / np.where(ss_tot > 0, ss_tot, 1), np.where(ss_res > 0, 0.0, 1.0))
+
+    prediction = slope[..., None] * predict + intercept[..., None]
+    return LinearFit(slope, intercept, prediction, r2)
+
 
 def linear_regression_1d(x: list, y: list, predict: list, plot: bool = False) -> list:
     """
@@ -15,18 +73,17 @@ def linear_regression_1d(x: list, y: list, predict: list, plot: bool = False) ->
     Returns:
         list: Predicted values.
     """
-    x = np.array(x).reshape(-1, 1)
-    predict = np.array(predict).reshape(-1, 1)
-
-    model = LinearRegression()
-    model.fit(x, y)
-    result = model.predict(predict).tolist()
+    fit = linear_regression_batch(x, y, predict)
+    result = fit.prediction.tolist()
 
     if plot:
+        # Only needed for debugging, and slow to import
+        import matplotlib.pyplot as plt
+
         plt.scatter(x, y, color='blue', label='Training data')
         # Plot regression line
-        x_line = np.linspace(min(x), max(x), 100).reshape(-1, 1)
-        y_line = model.predict(x_line)
+        x_line = np.linspace(min(x), max(x), 100)
+        y_line = fit.slope * x_line + fit.intercept
         plt.plot(x_line, y_line, color='red', label='Regression line')
         # Plot prediction point(s)
         plt.scatter(predict, result, color='green', marker='x', s=100, label='Prediction')
@@ -54,3 +111,21 @@ def smape(y_true, y_pred) -> float:
     if denominator == 0:
         return 0.0
     return abs(y_true - y_pred) / denominator * 100
+
+
+def smape_batch(y_true, y_pred) -> np.ndarray:
+    """
+    Calculate the SMAPE of many predictions at once, see `smape`.
+
+    Args:
+        y_true: True values
+        y_pred: Predicted values, same shape as y_true
+
+    Returns:
+        np.ndarray: SMAPE of each prediction as a percentage, 0 where both values are 0
+    """
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    denominator = (np.abs(y_true) + np.abs(y_pred)) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, np.abs(y_true - y_pred) / np.where(denominator > 0, denominator, 1) * 100, 0.0)
@@ -0,0 +1,156 @@
+import os
+import stat
+import tempfile
+import threading
+import time
+import traceback
+from typing import Callable, TextIO
+
+
+def write_temp_file(path: str, write: Callable[[TextIO], None]) -> str:
+    """
+    Write a file next to `path` that can then be moved over it with `os.replace`, which is atomic.
+    The contents are flushed to disk before returning, and the permissions of `path` are copied if it exists.
+
+    Args:
+        path: The file that will be replaced
+        write: Called with the open temporary file to write the contents
+
+    Returns:
+        str: Path of the temporary file
+
+    Raises:
+        Exception: Anything raised by `write`. The temporary file is removed first.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix="." + os.path.basename(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", newline="") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return tmp
+
+
+class WriteBehind:
+    """
+    Runs a save function on a background thread, coalescing bursts of requests into one save.
+
+    A save starts once no new request has arrived for `delay` seconds, or at the latest `max_delay`
+    seconds after the first unsaved request, so a steady stream of edits is still saved regularly.
+    Only one save runs at a time. `flush` saves any pending request straight away and waits for it.
+    """
+
+    def __init__(self, save: Callable[[], None], delay: float = 1.0, max_delay: float = 10.0, name: str = "write-behind"):
+        """
+        Args:
+            save: Function that persists the current state
+            delay: Quiet period before saving, in seconds
+            max_delay: Longest time a request can wait, in seconds
+            name: Name of the background thread
+        """
+        self._save = save
+        self._delay = delay
+        self._max_delay = max_delay
+        self._name = name
+        self._cond = threading.Condition()
+        self._first: float | None = None
+        self._last: float | None = None
+        self._retry_at = 0.0
+        self._saving = False
+        self._closed = False
+        self._thread: threading.Thread | None = None
+        self.saves = 0
+
+    def is_pending(self) -> bool:
+        """
+        Check whether there is a request that hasn't been saved yet.
+        """
+        with self._cond:
+            return self._first is not None or self._saving
+
+    def schedule(self) -> None:
+        """
+        Request a save. Returns immediately.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if self._first is None:
+                self._first = now
+            self._last = now
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self) -> None:
+        """
+        Save any pending request now, in the calling thread, and wait for a save in progress to finish.
+
+        Raises:
+            Exception: Anything raised by the save function. The request stays pending.
+        """
+        with self._cond:
+            while self._saving:
+                self._cond.wait()
+            if self._first is None:
+                return
+            self._claim()
+        self._run_save(raise_errors=True)
+
+    def close(self) -> None:
+        """
+        Flush any pending request and stop the background thread.
+        """
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _claim(self) -> None:
+        self._first = self._last = None
+        self._saving = True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        return
+                    if self._first is None or self._saving:
+                        self._cond.wait()
+                        continue
+                    due = max(min(self._last + self._delay, self._first + self._max_delay), self._retry_at)
+                    now = time.monotonic()
+                    if now >= due:
+                        break
+                    self._cond.wait(due - now)
+                self._claim()
+            self._run_save(raise_errors=False)
+
+    def _run_save(self, raise_errors: bool) -> None:
+        try:
+            self._save()
+            self.saves += 1
+        except Exception:
+            # Keep the request pending so it is retried, backing off in the background
+            with self._cond:
+                if self._first is None:
+                    self._first = self._last = time.monotonic()
+                if not raise_errors:
+                    self._retry_at = time.monotonic() + self._max_delay
+            if raise_errors:
+                raise
+            traceback.print_exc()
+        finally:
+            with self._cond:
+                self._saving = False
+                self._cond.notify_all()
@@ -0,0 +1,118 @@
+"""
+Sharing the columns of a roster with worker processes without pickling them.
+
+The columns that predictions read (ids, classes, EPA scores, marks and missing flags) are copied once into a
+single shared memory block. Workers attach to the block and wrap the columns in a Roster without copying
+them again. Names aren't shared, as no prediction depends on them. `shared_pool` starts a pool of processes
+that each attach to a block this way.
+"""
+
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable
+
+import numpy as np
+
+from lib.src.struct.roster import Roster
+
+COLUMNS = ["ids", "classes", "epas", "marks", "missing"]
+
+# Layout of the shared block: (column, dtype, shape, offset in bytes) per column
+Layout = list[tuple[str, str, tuple[int, ...], int]]
+
+
+def share_roster(roster: Roster) -> tuple[SharedMemory, Layout]:
+    """
+    Copy the roster columns into a new shared memory block.
+    The caller owns the block and must `close` and `unlink` it once the workers are done.
+
+    Args:
+        roster: The roster to share
+
+    Returns:
+        tuple[SharedMemory, Layout]: The block and the layout needed to attach to it
+    """
+    arrays = [np.ascontiguousarray(getattr(roster, column)) for column in COLUMNS]
+    layout = []
+    offset = 0
+    for column, array in zip(COLUMNS, arrays):
+        # Keep every column 8-byte aligned
+        offset = (offset + 7) // 8 * 8
+        layout.append((column, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+
+    shm = SharedMemory(create=True, size=max(offset, 1))
+    for (_, dtype, shape, start), array in zip(layout, arrays):
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=start)[...] = array
+    return shm, layout
+
+
+def attach_roster(name: str, layout: Layout) -> tuple[SharedMemory, Roster]:
+    """
+    Attach to a block created by `share_roster`. The roster is read-only, and only valid while the returned
+    block stays open.
+
+    Args:
+        name: Name of the shared memory block
+        layout: Layout returned by `share_roster`
+
+    Returns:
+        tuple[SharedMemory, Roster]: The attached block and a roster over its columns, with empty names
+    """
+    if sys.version_info >= (3, 13):
+        # Only the creating process may unlink the block
+        shm = SharedMemory(name=name, track=False)
+    else:
+        # Workers share their parent's resource tracker, which already tracks the block
+        shm = SharedMemory(name=name)
+
+    columns = {}
+    for column, dtype, shape, offset in layout:
+        array = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        columns[column] = array
+    roster = Roster(names=np.zeros(len(columns["ids"]), dtype="U1"), **columns)
+    return shm, roster
+
+
+@contextmanager
+def shared_pool(shared: tuple[SharedMemory, Layout], workers: int, initializer: Callable[..., None],
+                initargs: tuple = ()):
+    """
+    Start a pool of processes that each attach to a shared roster, e.g. from `DB.share`, and set up their
+    state with it. The block is closed and unlinked once the pool has shut down.
+
+    Args:
+        shared: The block and its layout. The pool takes ownership of the block.
+        workers: Number of processes
+        initializer: Module-level function called in each process with the attached roster and `initargs`
+        initargs: Further arguments for initializer
+
+    Yields:
+        ProcessPoolExecutor: The pool
+    """
+    shm, layout = shared
+    try:
+        # Spawn rather than fork, the parent has threads (e.g. the background saver) that may hold locks
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_shared_worker,
+                initargs=(shm.name, layout, initializer, initargs)) as pool:
+            yield pool
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+# Block attached by each `shared_pool` worker, kept open for the life of the process
+_worker_shm: SharedMemory | None = None
+
+
+def _init_shared_worker(name: str, layout: Layout, initializer: Callable[..., None], initargs: tuple) -> None:
+    global _worker_shm
+    _worker_shm, roster = attach_roster(name, layout)
+    initializer(roster, *initargs)
@@ -0,0 +1,89 @@
+"""
+Binary sidecar cache for roster CSVs.
+
+The columns of a parsed roster are stored as `.npy` files in `<csv>.cache/<mtime_ns>-<size>/`, keyed by the
+CSV's modification time and size. Opening the same CSV again memory-maps those files instead of parsing
+it, so only the pages that are actually used get read. Any change to the CSV changes its key, so a
+stale cache is never used, and a fresh one is written the next time the CSV is parsed.
+
+Each cache is written into a temporary directory that is renamed into place once complete, and older
+caches are removed afterwards. Files are never replaced in place, as a roster may still be mapping them.
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from lib.src.struct.roster import Roster
+
+COLUMNS = ["ids", "names", "classes", "epas", "marks", "missing"]
+
+
+def _cache_dir(csv_path: str) -> str:
+    return csv_path + ".cache"
+
+
+def _key(stamp: tuple[int, int]) -> str:
+    return f"{stamp[0]}-{stamp[1]}"
+
+
+def load_sidecar(csv_path: str, stamp: tuple[int, int]) -> Roster | None:
+    """
+    Open the cached roster for a CSV, if there is one for its current version.
+
+    The arrays are memory-mapped copy-on-write, so changes to the roster never reach the cache files.
+
+    Args:
+        csv_path: File path to the roster CSV
+        stamp: Modification time in nanoseconds and size of the CSV
+
+    Returns:
+        Roster | None: The cached roster, None if there is no usable cache
+    """
+    directory = os.path.join(_cache_dir(csv_path), _key(stamp))
+    try:
+        columns = {c: np.load(os.path.join(directory, c + ".npy"), mmap_mode="c") for c in COLUMNS}
+    except (OSError, ValueError):
+        return None
+    return Roster(**columns)
+
+
+def save_sidecar(csv_path: str, stamp: tuple[int, int], roster: Roster) -> bool:
+    """
+    Cache a parsed roster for the given version of a CSV and remove caches of older versions.
+    Failing to write the cache, e.g. in a read-only folder, isn't an error.
+
+    Args:
+        csv_path: File path to the roster CSV
+        stamp: Modification time in nanoseconds and size of the CSV the roster was parsed from
+        roster: The parsed roster
+
+    Returns:
+        bool: True if the cache was written
+    """
+    root = _cache_dir(csv_path)
+    key = _key(stamp)
+    try:
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=root, prefix=".tmp-")
+        try:
+            for column in COLUMNS:
+                values = getattr(roster, column)
+                if column == "names":
+                    # Fixed-width strings can be memory-mapped, Python objects can't
+                    values = values.astype(str) if len(values) else np.zeros(0, dtype="U1")
+                np.save(os.path.join(tmp, column + ".npy"), np.ascontiguousarray(values))
+            os.rename(tmp, os.path.join(root, key))
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    except OSError:
+        return False
+
+    for entry in os.listdir(root):
+        if entry != key:
+            # Caches still mapped by a roster can't be removed on Windows, they're retried next time
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return True
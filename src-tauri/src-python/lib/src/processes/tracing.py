@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class MarkTrace:
+    """
+    Record of one `calculate_mark` call: the decision branch that produced the mark, the intermediate
+    values it was based on, and how long each stage took.
+    """
+
+    __slots__ = ("student_id", "task_id", "branch", "values", "timings", "_last")
+
+    def __init__(self, student_id: int, task_id: int):
+        self.student_id = student_id
+        self.task_id = task_id
+        self.branch: str | None = None
+        self.values: dict = {}
+        self.timings: dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, stage: str) -> None:
+        """
+        Record the time taken by a stage, since the previous stage or the start of the call.
+
+        Args:
+            stage: Name of the stage that just finished
+        """
+        now = time.perf_counter()
+        self.timings[stage] = now - self._last
+        self._last = now
+
+    def to_dict(self) -> dict:
+        return {
+            "student_id": self.student_id,
+            "task_id": self.task_id,
+            "branch": self.branch,
+            "values": self.values,
+            "timings": self.timings,
+        }
+
+
+class Tracer:
+    """
+    Collects `MarkTrace` records while enabled.
+
+    Tracing is off by default. `begin` then returns None, and traced code only checks for None, so the
+    cost of disabled tracing is one attribute lookup per call. The most recent traces are kept, along with
+    a count of every branch taken since the last reset.
+    """
+
+    def __init__(self, maxlen: int = 1000):
+        """
+        Args:
+            maxlen: Number of recent traces to keep
+        """
+        self.enabled = False
+        self._traces: deque[MarkTrace] = deque(maxlen=maxlen)
+        self._branches: Counter[str] = Counter()
+        self._lock = threading.Lock()
+
+    def begin(self, student_id: int, task_id: int) -> MarkTrace | None:
+        """
+        Start tracing a calculation.
+
+        Args:
+            student_id: Student the mark is calculated for
+            task_id: Task the mark is calculated for
+
+        Returns:
+            MarkTrace | None: The trace to fill in, None if tracing is disabled
+        """
+        if not self.enabled:
+            return None
+        return MarkTrace(student_id, task_id)
+
+    def finish(self, trace: MarkTrace, branch: str) -> None:
+        """
+        Complete a trace with the branch that produced the mark and keep it.
+
+        Args:
+            trace: Trace returned by `begin`
+            branch: Name of the decision branch
+        """
+        trace.branch = branch
+        trace.lap("decision")
+        with self._lock:
+            self._traces.append(trace)
+            self._branches[branch] += 1
+
+    def histogram(self) -> dict[str, int]:
+        """
+        Get how often each decision branch was taken since the last reset.
+
+        Returns:
+            dict[str, int]: Number of calculations per branch, most frequent first
+        """
+        with self._lock:
+            return dict(self._branches.most_common())
+
+    def last(self) -> MarkTrace | None:
+        """
+        Get the most recent trace, e.g. to find the branch of a calculation that just finished.
+
+        Returns:
+            MarkTrace | None: The trace, None if there are none
+        """
+        with self._lock:
+            return self._traces[-1] if self._traces else None
+
+    def traces(self) -> list[dict]:
+        """
+        Get the most recent traces.
+
+        Returns:
+            list[dict]: Traces as dictionaries, oldest first
+        """
+        with self._lock:
+            return [t.to_dict() for t in self._traces]
+
+    def reset(self) -> None:
+        """
+        Remove every trace and branch count.
+        """
+        with self._lock:
+            self._traces.clear()
+            self._branches.clear()
+
+    @contextmanager
+    def tracing(self):
+        """
+        Enable tracing for the duration of a block, e.g. a cohort run, starting from a reset.
+
+        Yields:
+            Tracer: This tracer
+        """
+        previous = self.enabled
+        self.reset()
+        self.enabled = True
+        try:
+            yield self
+        finally:
+            self.enabled = previous
+
+
+tracer = Tracer()
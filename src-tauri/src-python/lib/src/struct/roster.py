@@ -0,0 +1,389 @@
+from importlib.util import find_spec
+
+import numpy as np
+import pandas as pd
+
+from lib.src.struct.students import Student
+
+TASK_COLUMNS = ["Task 1", "Task 2", "Task 3", "Task 4"]
+
+# Column types used when reading a roster CSV. Marks are parsed as floats with NaN where missing, which the
+# parsers handle natively, nullable "Int64" columns are built through a much slower path on both engines.
+CSV_DTYPES = {
+    "id": "int64",
+    "Class": "int64",
+    "EPA Score": "float64",
+    **{column: "float64" for column in TASK_COLUMNS},
+}
+
+# pyarrow dictionary-encodes categories while parsing, the C parser builds them from strings
+CSV_DTYPES_PYARROW = {**CSV_DTYPES, "Class": "category"}
+
+
+def csv_engine() -> str:
+    """
+    Pick the fastest available pandas CSV parser.
+
+    Returns:
+        str: "pyarrow" if pyarrow is installed, otherwise "c"
+    """
+    return "pyarrow" if find_spec("pyarrow") is not None else "c"
+
+
+def read_csv(path: str, engine: str | None = None) -> pd.DataFrame:
+    """
+    Read a roster CSV with explicit column types.
+
+    Args:
+        path: File path to CSV database
+        engine: pandas parser to use. If None, the fastest available one is picked.
+
+    Returns:
+        pd.DataFrame: The roster in the CSV layout, ready for `Roster.from_frame`
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+    """
+    engine = engine or csv_engine()
+    return pd.read_csv(path, dtype=CSV_DTYPES_PYARROW if engine == "pyarrow" else CSV_DTYPES, engine=engine)
+
+
+class Roster:
+    """
+    Struct-of-arrays storage for student records.
+
+    Each field is kept in its own NumPy array, with the task marks stored as an N×T integer matrix and a
+    matching boolean matrix marking the missing ones. Rows are only turned into `Student` objects when
+    a caller asks for them, so task-wide and class-wide queries can work directly on the columns.
+    """
+
+    def __init__(self, ids, names, classes, epas, marks, missing):
+        """
+        Create a roster from column arrays. All arrays must have the same number of rows.
+        Arrays that already have the storage type are used without copying, e.g. memory-mapped ones.
+
+        Args:
+            ids: Student identifiers
+            names: Student names, either Python strings or a fixed-width string array
+            classes: Class identifiers
+            epas: EPA scores
+            marks: N×T matrix of task marks, the value of missing marks is ignored
+            missing: N×T boolean matrix, True where the mark is missing
+        """
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._names = names if isinstance(names, np.ndarray) and names.dtype.kind == "U" else np.asarray(names, dtype=object)
+        self._classes = np.asarray(classes, dtype=np.int64)
+        self._epas = np.asarray(epas, dtype=np.float64)
+        self._missing = np.asarray(missing, dtype=bool)
+        if isinstance(marks, np.ndarray) and marks.dtype == np.int32:
+            self._marks = marks
+        else:
+            self._marks = np.where(self._missing, 0, marks).astype(np.int32)
+        self._size = len(self._ids)
+        self._max_id = int(self._ids.max()) if self._size else None
+        self._index: dict[int, int] | None = None
+
+    @staticmethod
+    def empty(tasks: int = len(TASK_COLUMNS)) -> "Roster":
+        """
+        Create a roster with no students.
+
+        Args:
+            tasks: Number of tasks per student
+
+        Returns:
+            Roster: An empty roster
+        """
+        return Roster([], [], [], [], np.zeros((0, tasks)), np.zeros((0, tasks), dtype=bool))
+
+    @staticmethod
+    def from_students(students: list[Student], tasks: int = len(TASK_COLUMNS)) -> "Roster":
+        """
+        Create a roster from a list of Student objects.
+
+        Args:
+            students: Students to store, in row order
+            tasks: Number of tasks per student
+
+        Returns:
+            Roster: A roster containing the students
+        """
+        if not students:
+            return Roster.empty(tasks)
+
+        rows = [s.get_all_tasks() for s in students]
+        return Roster(
+            [s.get_id() for s in students],
+            [s.get_name() for s in students],
+            [s.get_class() for s in students],
+            [s.get_epa() for s in students],
+            [[0 if t is None else t for t in r] for r in rows],
+            [[t is None for t in r] for r in rows],
+        )
+
+    @staticmethod
+    def from_frame(df: pd.DataFrame) -> "Roster":
+        """
+        Create a roster from a DataFrame in the CSV layout, converting whole columns at once.
+        Rows are sorted by id.
+
+        Args:
+            df: DataFrame read with `read_csv`
+
+        Returns:
+            Roster: A roster containing the rows of the DataFrame
+        """
+        ids = df["id"].to_numpy(dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+
+        classes = df["Class"]
+        if isinstance(classes.dtype, pd.CategoricalDtype):
+            # Only the (few) categories need converting, the rows are looked up by code
+            classes = np.asarray(classes.cat.categories, dtype=np.int64)[classes.cat.codes.to_numpy()]
+        else:
+            classes = classes.to_numpy(dtype=np.int64)
+
+        marks = df[TASK_COLUMNS].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+        return Roster(
+            ids[order],
+            df["Student"].to_numpy(dtype=object)[order],
+            classes[order],
+            df["EPA Score"].to_numpy(dtype=np.float64)[order],
+            marks,
+            np.isnan(marks),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert the roster to a DataFrame in the CSV layout, sorted by id. The columns are copies.
+
+        Returns:
+            pd.DataFrame: The roster, with nullable integer mark columns
+        """
+        data = {
+            "id": self.ids,
+            "Student": self.names.astype(object),
+            "Class": self.classes,
+            "EPA Score": self.epas,
+            **{
+                column: pd.arrays.IntegerArray(self.marks[:, i].copy(), self.missing[:, i].copy())
+                for i, column in enumerate(TASK_COLUMNS)
+            }
+        }
+        return pd.DataFrame(data).sort_values("id")
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def tasks(self) -> int:
+        """Number of tasks per student."""
+        return self._marks.shape[1]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    @property
+    def names(self) -> np.ndarray:
+        return self._names[:self._size]
+
+    @property
+    def classes(self) -> np.ndarray:
+        return self._classes[:self._size]
+
+    @property
+    def epas(self) -> np.ndarray:
+        return self._epas[:self._size]
+
+    @property
+    def marks(self) -> np.ndarray:
+        return self._marks[:self._size]
+
+    @property
+    def missing(self) -> np.ndarray:
+        return self._missing[:self._size]
+
+    @property
+    def max_id(self) -> int | None:
+        """Largest stored student identifier, None if the roster is empty."""
+        return self._max_id
+
+    def position(self, _id: int) -> int | None:
+        """
+        Find the row of a student by ID. The id index is built on the first lookup and kept up to date by
+        `set_row` and `append` afterwards.
+
+        Args:
+            _id: Student identifier
+
+        Returns:
+            int | None: Row position, None if the student isn't stored
+        """
+        if self._index is None:
+            # Build from the end so the first row wins for duplicated ids
+            n = self._size
+            self._index = dict(zip(self.ids[::-1].tolist(), range(n - 1, -1, -1)))
+        return self._index.get(_id)
+
+    def averages(self) -> np.ndarray:
+        """
+        Calculate the average of the present marks for every student.
+
+        Returns:
+            np.ndarray: Average mark per row, NaN for students without any marks
+        """
+        present = ~self.missing
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(present, self.marks, 0).sum(axis=1) / present.sum(axis=1)
+
+    def ranks(self, task: int) -> np.ndarray:
+        """
+        Rank every student on a task with a single sort, the highest mark ranking first.
+
+        Tied marks share the best rank (competition ranking, e.g. 1, 2, 2, 4), like `SortedIndex.rank`.
+
+        Args:
+            task: Task number (1-based)
+
+        Returns:
+            np.ndarray: Rank per row as floats, NaN for students missing the mark
+        """
+        ranks = np.full(self._size, np.nan)
+        present = np.flatnonzero(~self.missing[:, task - 1])
+        values = self.marks[present, task - 1]
+        order = np.argsort(-values, kind="stable")
+        ordered = values[order]
+
+        # Every mark takes the rank of the first mark of its run of ties
+        first = np.ones(len(ordered), dtype=bool)
+        first[1:] = ordered[1:] != ordered[:-1]
+        ranks[present[order]] = np.maximum.accumulate(np.where(first, np.arange(len(ordered)), 0)) + 1
+        return ranks
+
+    def average_at(self, pos: int) -> float | None:
+        """
+        Calculate the average of the present marks of one row.
+
+        Args:
+            pos: Row position
+
+        Returns:
+            float | None: Average mark, None if the student doesn't have any marks
+        """
+        present = ~self._missing[pos]
+        count = int(present.sum())
+        if not count:
+            return None
+        return int(self._marks[pos][present].sum()) / count
+
+    def student_at(self, pos: int) -> Student:
+        """
+        Materialise a row as a Student object. The returned object doesn't share any state with the roster.
+
+        Args:
+            pos: Row position
+
+        Returns:
+            Student: The student stored at the position
+        """
+        tasks = tuple(None if m else v for v, m in zip(self._marks[pos].tolist(), self._missing[pos].tolist()))
+        return Student(
+            int(self._ids[pos]),
+            str(self._names[pos]),
+            int(self._classes[pos]),
+            float(self._epas[pos]),
+            tasks,
+        )
+
+    def students_at(self, positions) -> list[Student]:
+        """
+        Materialise several rows as Student objects.
+
+        Args:
+            positions: Row positions
+
+        Returns:
+            list[Student]: The students stored at the positions, in the same order
+        """
+        return [self.student_at(p) for p in positions]
+
+    def select(self, positions) -> "Roster":
+        """
+        Create a roster from some of the rows. The columns are copies.
+
+        Args:
+            positions: Row positions, or a boolean mask over the rows
+
+        Returns:
+            Roster: The selected rows, in the same order
+        """
+        return Roster(
+            self.ids[positions],
+            self.names[positions],
+            self.classes[positions],
+            self.epas[positions],
+            self.marks[positions],
+            self.missing[positions],
+        )
+
+    def set_row(self, pos: int, student: Student) -> None:
+        """
+        Overwrite a row with the values of a Student object.
+
+        Args:
+            pos: Row position
+            student: Student to store
+        """
+        tasks = student.get_all_tasks()
+        _id = int(student.get_id())
+        if self._index is not None and self._ids[pos] != _id:
+            if self._index.get(int(self._ids[pos])) == pos:
+                del self._index[int(self._ids[pos])]
+            self._index.setdefault(_id, pos)
+        if self._max_id is None or _id > self._max_id:
+            self._max_id = _id
+
+        if self._names.dtype != object:
+            # Fixed-width strings would truncate longer names
+            self._names = self._names.astype(object)
+
+        self._ids[pos] = _id
+        self._names[pos] = student.get_name()
+        self._classes[pos] = student.get_class()
+        self._epas[pos] = student.get_epa()
+        self._marks[pos] = [0 if t is None else t for t in tasks]
+        self._missing[pos] = [t is None for t in tasks]
+
+    def append(self, student: Student) -> int:
+        """
+        Add a Student object as a new row, growing the arrays geometrically when full.
+
+        Args:
+            student: Student to store
+
+        Returns:
+            int: Position of the new row
+        """
+        if self._size == len(self._ids):
+            capacity = max(8, 2 * len(self._ids))
+            self._ids = self._grow(self._ids, capacity)
+            self._names = self._grow(self._names, capacity)
+            self._classes = self._grow(self._classes, capacity)
+            self._epas = self._grow(self._epas, capacity)
+            self._marks = self._grow(self._marks, capacity)
+            self._missing = self._grow(self._missing, capacity)
+
+        pos = self._size
+        self._size += 1
+        self._ids[pos] = student.get_id()
+        if self._index is not None:
+            self._index.setdefault(student.get_id(), pos)
+        self.set_row(pos, student)
+        return pos
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int) -> np.ndarray:
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
@@ -0,0 +1,92 @@
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
+
+
+class SortedIndex:
+    """
+    Sorted multiset of values answering rank queries by binary search.
+
+    Lookups are O(log n). Adding or removing a value is a binary search followed by a shift of the
+    underlying list, which is a single memmove and stays cheap even for hundreds of thousands of values.
+    """
+
+    def __init__(self, values=()):
+        """
+        Build the index.
+
+        Args:
+            values: Initial values, in any order
+        """
+        self._values = np.sort(np.asarray(values)).tolist()
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value) -> None:
+        """
+        Insert a value, keeping the index sorted.
+
+        Args:
+            value: Value to insert
+        """
+        insort(self._values, value)
+
+    def remove(self, value) -> None:
+        """
+        Remove one occurrence of a value.
+
+        Args:
+            value: Value to remove
+
+        Raises:
+            ValueError: If the value isn't in the index
+        """
+        i = bisect_left(self._values, value)
+        if i == len(self._values) or self._values[i] != value:
+            raise ValueError(f"{value} is not in the index")
+        del self._values[i]
+
+    def count_below(self, value) -> int:
+        """
+        Count the stored values strictly smaller than a value.
+        """
+        return bisect_left(self._values, value)
+
+    def count_above(self, value) -> int:
+        """
+        Count the stored values strictly greater than a value.
+        """
+        return len(self._values) - bisect_right(self._values, value)
+
+    def rank(self, value) -> int:
+        """
+        Get the 1-based rank of a value, where the largest value ranks first.
+
+        Tied values share the best rank (competition ranking, e.g. 1, 2, 2, 4), and values that aren't
+        stored rank where they would be inserted.
+
+        Args:
+            value: Value to rank
+
+        Returns:
+            int: The rank of the value
+        """
+        return self.count_above(value) + 1
+
+    def nth_largest(self, n: int):
+        """
+        Get the value at a 1-based position from the top, counting tied values separately.
+
+        Args:
+            n: Position, 1 for the largest value
+
+        Returns:
+            The value
+
+        Raises:
+            IndexError: If n is outside 1 to the number of values
+        """
+        if n < 1 or n > len(self._values):
+            raise IndexError(f"{n} is outside the {len(self._values)} values")
+        return self._values[-n]
@@ -1,13 +1,22 @@
 from lib.src.processes.utils import Result, Ok, Err
-import math
 
 
 class Student:
+    """
+    A single student record.
+
+    The marks are held in a tuple that is never modified in place: `update_mark` and `with_mark` build a new
+    tuple instead. Copies of a student can therefore share their marks safely, so there's no need to
+    deep copy a record to keep it isolated.
+    """
+
+    __slots__ = ("_id", "_name", "_epa", "_tasks", "_class")
+
     def __init__(self, id:int, name: str, _class:str, epa: float, tasks:(int|None,int|None,int|None,int|None)) -> None:
         self._id = id
         self._name = name
         self._epa = epa
-        self._tasks = tasks
+        self._tasks = tuple(tasks)
         self._class = _class
 
     @staticmethod
@@ -22,8 +31,10 @@ class Student:
            Student: An instance of the Student class.
        """
 
+       import pandas as pd
+
        def to_none(val):
-           return None if (val is None or (isinstance(val, float) and math.isnan(val))) else val
+           return None if pd.isna(val) else val
 
        return Student(
            r["id"],
@@ -47,10 +58,25 @@ class Student:
 
     def update_mark(self, task_id:int, new:int, override=False) -> Result:
         if self._tasks[task_id-1] is None or override == True:
-            self._tasks[task_id-1] = new
+            self._tasks = self._tasks[:task_id-1] + (new,) + self._tasks[task_id:]
             return Ok()
         return Err("Task value already exists. Ignoring.")
 
+    def with_mark(self, task_id:int, new:int|None) -> "Student":
+        """
+        Create a copy of the student with one mark replaced. The original student is left unchanged.
+
+        Args:
+            task_id: Task number (1-4)
+            new: The new mark, None to clear it
+
+        Returns:
+            Student: The updated copy
+        """
+        copy = Student(self._id, self._name, self._class, self._epa, ())
+        copy._tasks = self._tasks[:task_id-1] + (new,) + self._tasks[task_id:]
+        return copy
+
     def get_id(self):
         return self._id
 
@@ -1 +1,19 @@
-from .data_tests import *
\ No newline at end of file
+from .data_tests import *
+from .registry_tests import *
+from .roster_tests import *
+from .sorted_index_tests import *
+from .regression_tests import *
+from .import_tests import *
+from .journal_tests import *
+from .saver_tests import *
+from .sidecar_tests import *
+from .store_tests import *
+from .payload_tests import *
+from .lru_cache_tests import *
+from .impute_tests import *
+from .offload_tests import *
+from .tracing_tests import *
+from .metrics_tests import *
+from .benchmark_tests import *
+from .generator_tests import *
+from .evaluation_tests import *
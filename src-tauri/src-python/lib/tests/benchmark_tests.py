@@ -0,0 +1,25 @@
+import unittest
+
+from lib.tests.benchmarks import compare, run
+
+"""
+This file contains a smoke test of the benchmark suite, see benchmarks.py for running it.
+"""
+class TestBenchmarks(unittest.TestCase):
+    def test_run(self):
+        """
+        Test to ensure every benchmark runs on a small roster and regressions are found against baselines
+        """
+        results = run([1_000], samples=5)
+        benchmarks = results["1000"]
+        for name in ("load", "rank_task", "rank_avg", "calculate_mark", "update_save", "serialize_columns"):
+            assert benchmarks[name]["seconds_per_op"] > 0
+            assert benchmarks[name]["peak_bytes"] > 0 or name.startswith("rank")
+
+        faster = {"1000": {"load": {"seconds_per_op": benchmarks["load"]["seconds_per_op"] / 10}}}
+        assert compare(results, results) == []
+        assert [r.split(" ")[0] for r in compare(results, faster)] == ["load"]
+
+
+if __name__ == '__main__':
+    unittest.main()
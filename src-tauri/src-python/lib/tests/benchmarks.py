@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+
+from lib.src.processes.db import DB
+from lib.src.processes.ml import calculate_mark
+from lib.tests.data import generate
+
+"""
+Benchmark suite for the load, rank, predict, save and serialization paths, on synthetic rosters.
+
+Each benchmark is timed over a number of operations, keeping the fastest of several runs, and reported as
+seconds per operation and operations per second. It is then run once more under tracemalloc to report
+its peak memory. Results can be saved as
+baselines and compared against on later runs:
+
+    python benchmarks.py                          # 1k, 10k and 100k students
+    python benchmarks.py --sizes 1000 1000000     # any sizes
+    python benchmarks.py --save                   # store the results as the baselines
+    python benchmarks.py --compare                # fail if anything is slower than its baseline
+
+Baselines are machine specific, regenerate them with --save when moving to another machine.
+"""
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baselines.json")
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+
+# A benchmark is slower than its baseline if it takes more than this many times as long. Timings of the
+# fastest benchmarks vary by up to ~1.8x between runs on a busy machine.
+DEFAULT_TOLERANCE = 2.0
+
+SEED = 42
+
+# Probability of each mark being missing in the synthetic rosters
+MISSING = 0.005
+
+# Number of rank lookups per run
+RANK_LOOKUPS = 10_000
+
+
+def measure(func: Callable[[], object], ops: int, warm_up: bool = True, repeat: int = 5) -> dict[str, float]:
+    """
+    Time a benchmark, taking the fastest of several runs, then run it again under tracemalloc for its
+    peak memory.
+
+    Args:
+        func: Runs the benchmark once, performing `ops` operations
+        ops: Number of operations per run
+        warm_up: Whether to run it once first, so lazily built indexes aren't included in the timings
+        repeat: Number of timed runs
+
+    Returns:
+        dict[str, float]: Seconds per operation, operations per second and peak memory in bytes
+    """
+    if warm_up:
+        func()
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds_per_op": seconds / ops, "ops_per_second": ops / seconds, "peak_bytes": peak}
+
+
+def run_size(n: int, samples: int = 20) -> dict[str, dict[str, float]]:
+    """
+    Run every benchmark on a synthetic roster.
+
+    Args:
+        n: Number of students
+        samples: Number of students to rank, predict and update per run
+
+    Returns:
+        dict[str, dict[str, float]]: Results by benchmark name, see `measure`
+    """
+    folder = tempfile.mkdtemp()
+    try:
+        path = os.path.join(folder, "roster.csv")
+        generate(path, n, missing=MISSING, seed=SEED)
+        db = DB(path)
+        rng = random.Random(SEED)
+        students = [db.get_with_id(i).unwrap() for i in rng.sample(range(n), min(samples, n))]
+        complete = [s for s in students if None not in s.get_all_tasks()]
+        # Rank lookups take microseconds, repeat them enough to time reliably
+        lookups = (students * (RANK_LOOKUPS // len(students) + 1))[:RANK_LOOKUPS]
+        complete_lookups = [s for s in lookups if None not in s.get_all_tasks()]
+
+        def update_and_save():
+            for s in students:
+                db.update_student(s.with_mark(1, rng.randint(0, 100)))
+            db.flush()
+
+        results = {
+            "load": measure(lambda: DB(path), 1, warm_up=False, repeat=3),
+            "rank_task": measure(lambda: [db.get_student_rank_task(s, 2) for s in complete_lookups], len(complete_lookups)),
+            "rank_avg": measure(lambda: [db.get_student_rank_avg(s) for s in lookups], len(lookups)),
+            "calculate_mark": measure(
+                lambda: [calculate_mark(db, s.with_mark(2, None), 2) for s in complete], len(complete)),
+            "update_save": measure(update_and_save, len(students)),
+            "serialize_columns": measure(lambda: db.get_columns().unwrap(), n),
+        }
+
+        try:
+            from mltasktauri import PYStudent
+            from pydantic import RootModel
+        except (ImportError, RuntimeError):
+            pass
+        else:
+            results["serialize_models"] = measure(
+                lambda: RootModel([PYStudent.from_student(s) for s in db.get_all().unwrap()]).model_dump_json(), n)
+        db.close()
+        return results
+    finally:
+        shutil.rmtree(folder)
+
+
+def run(sizes: list[int], samples: int = 20) -> dict[str, dict[str, dict[str, float]]]:
+    """
+    Run the benchmarks for several roster sizes.
+
+    Args:
+        sizes: Numbers of students
+        samples: See `run_size`
+
+    Returns:
+        dict[str, dict[str, dict[str, float]]]: Results by roster size (as a string) and benchmark name
+    """
+    return {str(n): run_size(n, samples) for n in sizes}
+
+
+def compare(results: dict, baselines: dict, tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """
+    Find the benchmarks that got slower than their baseline.
+
+    Args:
+        results: Results of `run`
+        baselines: Earlier results of `run`
+        tolerance: Allowed slowdown factor
+
+    Returns:
+        list[str]: A description of every regression, empty if there are none
+    """
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            baseline = baselines.get(size, {}).get(name)
+            if baseline is None:
+                continue
+            ratio = result["seconds_per_op"] / baseline["seconds_per_op"]
+            if ratio > tolerance:
+                regressions.append(f"{name} @ {size}: {ratio:.2f}x slower than the baseline")
+    return regressions
+
+
+def load_baselines(path: str = BASELINES_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def print_report(results: dict) -> None:
+    for size, benchmarks in results.items():
+        print(f"{int(size):,} students")
+        for name, r in benchmarks.items():
+            print(f"  {name:<18} {r['seconds_per_op'] * 1000:12.3f} ms/op {r['ops_per_second']:14,.1f} op/s "
+                  f"{r['peak_bytes'] / (1 << 20):10.1f} MiB peak")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the roster load, rank, predict, save and serialization paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="roster sizes to run")
+    parser.add_argument("--samples", type=int, default=20, help="students to rank, predict and update per run")
+    parser.add_argument("--save", action="store_true", help="store the results as the baselines")
+    parser.add_argument("--compare", action="store_true", help="exit with an error if anything regressed")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown factor")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.samples)
+    print_report(results)
+
+    if args.compare:
+        regressions = compare(results, load_baselines(), args.tolerance)
+        for regression in regressions:
+            print(regression)
+        if regressions:
+            sys.exit(1)
+
+    if args.save:
+        baselines = {**load_baselines(), **results}
+        with open(BASELINES_PATH, "w") as f:
+            json.dump(baselines, f, indent=2)
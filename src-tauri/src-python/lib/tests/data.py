@@ -1,51 +1,33 @@
-import pandas as pd
-import numpy as np
-from faker import Faker
+import argparse
 import math
 import os
+from importlib.util import find_spec
+from typing import BinaryIO
+
+import numpy as np
+import pandas as pd
+
+"""
+Synthetic roster generator.
+
+Students get a latent ability and an EPA score, and are placed in classes with a teacher of random quality.
+The first task mark follows the ability and the teacher, and every later task improves on the previous one
+depending on the student's EPA, the teacher and the class's mean (a peer effect). Marks are kept in [0, 100],
+and each student's EPA score is re-estimated from their marks, kept in [0, 5].
+
+Everything is vectorized, and students are generated and written in chunks of whole classes, so the memory
+used depends on the chunk size rather than the number of students:
+
+    python data.py                                  # 1000 students to ./data/students_marks.csv
+    python data.py --students 5000000 --missing 0.02 --out big.csv
+"""
+
+# Mark difficulty per task, later tasks use the last one
+DIFFICULTIES = [0, 10, 10, 20]
 
-# --- CONFIG & SEED ---
-SEED = 42
-np.random.seed(SEED)
-Faker.seed(SEED)
-fake = Faker()
-
-# STUDENTS & CLASSES
-N = 1000
-CLASS_SIZE = 25
-n_classes = math.ceil(N / CLASS_SIZE)
-class_ids = np.arange(1, n_classes + 1)
-
-# GENERATE UNIQUE NAMES
-names = []
-seen = set()
-while len(names) < N:
-    nm = fake.name()
-    if nm not in seen:
-        seen.add(nm)
-        names.append(nm)
-
-# ASSIGN & SHUFFLE CLASSES
-classes = np.repeat(class_ids, CLASS_SIZE)[:N]
-np.random.shuffle(classes)
-
-# LATENT ABILITY ∼ N(75,10)
-latent = np.random.normal(75, 10, N)
-
-# EPA “true” score (uncut)
-epa = (latent - latent.mean()) * 0.03 + 2.5 + np.random.normal(0, 0.5, N)
-# some will fall outside [0,5]—we'll fix below by rejection sampling
-
-# TEACHER QUALITY
-teacher_q = {c: np.random.normal(0,1) for c in class_ids}
-
-# TASKS & DIFFICULTIES
-tasks = ["Task 1", "Task 2", "Task 3", "Task 4"]
-difficulties = {"Task 1":0, "Task 2":10, "Task 3":10, "Task 4":20}
-
-# SIMULATION PARAMS
-α_teacher = 2.0    # teacher effect on Task 1
-β_latent  = 1.0    # latent effect on Task 1
+# Simulation parameters
+α_teacher = 2.0    # teacher effect on Task 1
+β_latent  = 1.0    # latent effect on Task 1
 base_imp  = 1.0    # baseline gain per task
 γ_epa     = 0.8    # EPA’s effect on gain
 δ_teacher = 0.3    # teacher’s effect on gain
@@ -53,82 +35,192 @@ base_imp  = 1.0    # baseline gain per task
 σ_imp     = 2.5    # noise in improvement
 σ_mark    = 5.0    # noise in final mark
 
-# --- 1) BUILD ABILITIES & RAW MARKS ----
-abilities = np.zeros((N, len(tasks)))
-marks     = np.zeros_like(abilities)
-
-# Task 1 initial ability
-abilities[:,0] = (
-    β_latent * latent
-    + α_teacher * np.vectorize(teacher_q.get)(classes)
-)
-
-# Tasks 2–4: sequential improvement
-for t in range(1, len(tasks)):
-    prev = abilities[:, t-1]
-    class_mean = {c: prev[classes==c].mean() for c in class_ids}
-    overall   = prev.mean()
-    for i in range(N):
-        c = classes[i]
-        # EPA term: if epa<3 negative, if >3 positive
-        epa_term = γ_epa * (epa[i] - 3.0)
-        μ_imp = base_imp + epa_term + δ_teacher*teacher_q[c] + ρ_peer*(class_mean[c] - overall)
-        abilities[i,t] = prev[i] + np.random.normal(μ_imp, σ_imp)
-
-# Convert to raw marks (ability – difficulty + noise)
-raw_marks = np.zeros_like(abilities)
-for idx, task in enumerate(tasks):
-    raw = abilities[:, idx] - difficulties[task]
-    raw_marks[:, idx] = raw + np.random.normal(0, σ_mark, N)
-
-# --- 2) REJECTION-SAMPLE MARKS INTO [0,100] ----
-# For each task, resample only those outside bounds
-final_marks = raw_marks.copy()
-for idx in range(len(tasks)):
-    mask = (final_marks[:,idx] < 0) | (final_marks[:,idx] > 100)
-    while mask.any():
-        # regenerate noise and reapply
-        reraw = abilities[mask, idx] - difficulties[tasks[idx]]
-        final_marks[mask, idx] = reraw + np.random.normal(0, σ_mark, mask.sum())
-        mask = (final_marks[:,idx] < 0) | (final_marks[:,idx] > 100)
-
-# --- 3) ESTIMATE per-task EPA WITH REJECTION-SAMPLING → [0,5] ----
-def sample_epa(mark):
-    # piecewise mean + varying noise
-    if mark >= 90:
-        μ, σ = 4.8, 0.1
-    elif mark >= 80:
-        μ, σ = 4.2, 0.5
-    elif mark >= 70:
-        μ, σ = 3.5, 0.8
-    elif mark >= 60:
-        μ, σ = 2.8, 1.2
-    else:
-        μ, σ = 1.5, 1.5  # lower mean & wider σ for true low-EPA
-    # rejection sample until in [0,5]
-    while True:
-        val = np.random.normal(μ, σ)
-        if 0.0 <= val <= 5.0:
-            return val
-
-# Vectorize over marks
-vec_epa = np.vectorize(sample_epa)
-epa_per_task = np.zeros_like(final_marks)
-for j in range(len(tasks)):
-    epa_per_task[:,j] = vec_epa(final_marks[:,j])
-
-# Student’s avg EPA
-epa_score = np.round(epa_per_task.mean(axis=1), 2)
-
-# --- 4) BUILD & SAVE DATAFRAME ----
-df = pd.DataFrame({
-    "id":            np.arange(N),
-    "Student":       names,
-    "Class":         classes,
-    "EPA Score":     epa_score,
-    "Latent Ability": np.round(latent, 1),
-    **{tasks[j]: final_marks[:,j].round().astype(int) for j in range(len(tasks))}
-})
-
-os.makedirs("./data", exist_ok=True)
-df.to_csv("./data/students_marks.csv", index=False)
+# Mean and noise of the EPA estimated from a mark, by the lowest mark of each band
+EPA_BANDS = np.array([90, 80, 70, 60])
+EPA_MEANS = np.array([4.8, 4.2, 3.5, 2.8, 1.5])
+EPA_SIGMAS = np.array([0.1, 0.5, 0.8, 1.2, 1.5])  # lower mean & wider σ for true low-EPA
+
+# Resampling rounds before clipping the values still out of range. A mean 4σ outside the range would
+# otherwise take ~30k rounds on average.
+MAX_RESAMPLES = 32
+
+# Number of first and last names combined into student names
+NAME_POOL = 1000
+
+
+def truncated_normal(rng: np.random.Generator, mean, sigma, low: float, high: float) -> np.ndarray:
+    """
+    Sample normal values, resampling those outside [low, high]. Values still outside after `MAX_RESAMPLES`
+    rounds, whose means lie far outside the range, are clipped to it.
+
+    Args:
+        rng: Random generator
+        mean: Mean of each value
+        sigma: Standard deviation of each value
+        low: Smallest allowed value
+        high: Largest allowed value
+
+    Returns:
+        np.ndarray: The samples, shaped like mean and sigma broadcast together
+    """
+    mean, sigma = np.broadcast_arrays(np.asarray(mean, dtype=float), np.asarray(sigma, dtype=float))
+    shape = mean.shape
+    mean, sigma = mean.ravel(), sigma.ravel()
+    values = rng.normal(mean, sigma)
+    # Only the values still outside are resampled
+    bad = np.flatnonzero((values < low) | (values > high))
+    for _ in range(MAX_RESAMPLES):
+        if not bad.size:
+            break
+        values[bad] = rng.normal(mean[bad], sigma[bad])
+        bad = bad[(values[bad] < low) | (values[bad] > high)]
+    return np.clip(values, low, high).reshape(shape)
+
+
+def name_pools(seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generate the first and last names student names are combined from. Names come from Faker if it's
+    installed, and are numbered placeholders otherwise.
+
+    Args:
+        seed: Random seed
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: First names and last names
+    """
+    try:
+        from faker import Faker
+    except ImportError:
+        return (np.array([f"First{i}" for i in range(NAME_POOL)]),
+                np.array([f"Last{i}" for i in range(NAME_POOL)]))
+
+    fake = Faker()
+    Faker.seed(seed)
+    return (np.array([fake.first_name() for _ in range(NAME_POOL)]),
+            np.array([fake.last_name() for _ in range(NAME_POOL)]))
+
+
+def generate_chunk(rng: np.random.Generator, start: int, n: int, class_size: int, teacher_q: np.ndarray,
+                   tasks: int, missing: float, first: np.ndarray, last: np.ndarray) -> pd.DataFrame:
+    """
+    Generate consecutive students. `start` and `n` should be multiples of the class size, so every class
+    is generated in a single chunk.
+
+    Args:
+        rng: Random generator for the chunk
+        start: ID of the first student
+        n: Number of students
+        class_size: Students per class
+        teacher_q: Teacher quality per class, indexed by class ID - 1
+        tasks: Number of tasks
+        missing: Probability of each mark being missing
+        first: Pool of first names
+        last: Pool of last names
+
+    Returns:
+        pd.DataFrame: The students in the CSV layout
+    """
+    # Assign & shuffle classes
+    first_class = start // class_size
+    n_classes = math.ceil(n / class_size)
+    classes = np.repeat(np.arange(n_classes), class_size)[:n]
+    rng.shuffle(classes)
+    q = teacher_q[first_class + classes]
+
+    # Latent ability ∼ N(75,10) and the "true" EPA
+    latent = rng.normal(75, 10, n)
+    epa = (latent - 75) * 0.03 + 2.5 + rng.normal(0, 0.5, n)
+
+    # Task 1 initial ability, then sequential improvement
+    abilities = np.empty((n, tasks))
+    abilities[:, 0] = β_latent * latent + α_teacher * q
+    counts = np.bincount(classes, minlength=n_classes)
+    for t in range(1, tasks):
+        prev = abilities[:, t - 1]
+        class_mean = np.bincount(classes, weights=prev, minlength=n_classes) / np.maximum(counts, 1)
+        μ_imp = base_imp + γ_epa * (epa - 3.0) + δ_teacher * q + ρ_peer * (class_mean[classes] - prev.mean())
+        abilities[:, t] = prev + rng.normal(μ_imp, σ_imp)
+
+    # Marks are the ability less the difficulty plus noise, rejection-sampled into [0, 100]
+    difficulty = np.array([DIFFICULTIES[min(t, len(DIFFICULTIES) - 1)] for t in range(tasks)])
+    marks = truncated_normal(rng, abilities - difficulty, σ_mark, 0, 100)
+
+    # Estimate an EPA per task from its mark, rejection-sampled into [0, 5], and average them
+    band = np.searchsorted(-EPA_BANDS, -marks, side="right")
+    epa_score = truncated_normal(rng, EPA_MEANS[band], EPA_SIGMAS[band], 0, 5).mean(axis=1).round(2)
+
+    marks = marks.round().astype(np.int64)
+    gaps = rng.random(marks.shape) < missing
+    names = np.char.add(np.char.add(first[rng.integers(0, len(first), n)], " "), last[rng.integers(0, len(last), n)])
+
+    return pd.DataFrame({
+        "id": np.arange(start, start + n),
+        "Student": names,
+        "Class": first_class + classes + 1,
+        "EPA Score": epa_score,
+        "Latent Ability": latent.round(1),
+        **{f"Task {t + 1}": pd.arrays.IntegerArray(marks[:, t], gaps[:, t]) for t in range(tasks)},
+    })
+
+
+def write_chunk(f: BinaryIO, chunk: pd.DataFrame, header: bool) -> None:
+    """
+    Append students to a CSV file, with pyarrow's CSV writer if it's installed, as it's ~10x faster than pandas'.
+
+    Args:
+        f: File to write to
+        chunk: Students to write
+        header: Whether to write the header first
+    """
+    if find_spec("pyarrow") is None:
+        chunk.to_csv(f, header=header, index=False)
+        return
+
+    import pyarrow as pa
+    import pyarrow.csv
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    pyarrow.csv.write_csv(table, f, pyarrow.csv.WriteOptions(include_header=header, quoting_style="needed"))
+
+
+def generate(path: str, students: int = 1000, class_size: int = 25, tasks: int = 4, missing: float = 0.0,
+             seed: int = 42, chunk_size: int = 100_000) -> None:
+    """
+    Write a synthetic roster CSV, generating and writing the students in chunks.
+
+    The output depends on the seed and the chunk size, not on anything else.
+
+    Args:
+        path: File to write
+        students: Number of students
+        class_size: Students per class
+        tasks: Number of tasks
+        missing: Probability of each mark being missing
+        seed: Random seed
+        chunk_size: Students per chunk, rounded up to whole classes
+    """
+    chunk_size = max(1, math.ceil(chunk_size / class_size)) * class_size
+    teacher_q = np.random.default_rng([seed, 0]).normal(0, 1, math.ceil(students / class_size))
+
+    first, last = name_pools(seed)
+
+    with open(path, "wb") as f:
+        for i, start in enumerate(range(0, students, chunk_size)):
+            rng = np.random.default_rng([seed, i + 1])
+            chunk = generate_chunk(rng, start, min(chunk_size, students - start), class_size, teacher_q,
+                                   tasks, missing, first, last)
+            write_chunk(f, chunk, header=i == 0)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic roster CSV.")
+    parser.add_argument("--students", type=int, default=1000, help="number of students")
+    parser.add_argument("--class-size", type=int, default=25, help="students per class")
+    parser.add_argument("--tasks", type=int, default=4, help="number of tasks")
+    parser.add_argument("--missing", type=float, default=0.0, help="probability of each mark being missing")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="students generated at once")
+    parser.add_argument("--out", default="./data/students_marks.csv", help="file to write")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    generate(args.out, args.students, args.class_size, args.tasks, args.missing, args.seed, args.chunk_size)
@@ -1,13 +1,11 @@
+import threading
 import unittest
 import numpy as np
 
-from sklearn.metrics import r2_score
 from lib.src.processes.db import DB
-from lib.src.processes.ml import calculate_mark, check_consistency_percent, calculate_mark_on_rank
-from lib.src.processes.regression import smape
+from lib.src.processes.evaluation import evaluate, format_report
+from lib.src.processes.ml import check_consistency_percent, calculate_mark_on_rank, calculate_mark_cached
 from lib.src.struct.students import Student
-from sklearn.model_selection import train_test_split
-import random
 
 """
 This file contains tests for the DB class and its methods. Including tests for generating marks.
@@ -35,6 +33,21 @@ class TestDB(unittest.TestCase):
         s._name = "hmm2"
         assert self.db.get_with_id(1).unwrap()._name == "hmm"
 
+    def test_copy_on_write(self):
+        """
+        Test to ensure changing a mark never affects other copies of the student
+        """
+        s = self.db.get_with_id(1).unwrap()
+        updated = s.with_mark(1, 0)
+        assert updated.get_task(1) == 0
+        assert s.get_task(1) != 0
+
+        self.db.update_student(updated, False)
+        s.update_mark(2, 0, override=True)
+        assert self.db.get_with_id(1).unwrap().get_task(1) == 0
+        assert self.db.get_with_id(1).unwrap().get_task(2) != 0
+        assert updated.get_task(2) != 0
+
     def test_rank(self):
         """
         Test to ensure that the students rank works as expected
@@ -43,59 +56,265 @@ class TestDB(unittest.TestCase):
         s = Student(-1, "Test", "Test", 5, (100, 100, 100, 100))
         assert self.db.get_student_rank_task(s, 3).unwrap() == 1
 
+        # Test to ensure that the rank follows updated marks
+        s = self.db.get_with_id(1).unwrap()
+        rank = self.db.get_student_rank_task(s, 3).unwrap()
+        self.db.update_student(s.with_mark(3, 100), False)
+        assert self.db.get_student_rank_task(self.db.get_with_id(1).unwrap(), 3).unwrap() == 1
+        assert self.db.get_student_rank_task(s, 3).unwrap() == rank + 1
+
         # Test to ensure that the student rank for average works as expected
         print(calculate_mark_on_rank(self.db, 200, 1).unwrap())
         print(self.db.get_student_rank_avg(self.db.get_with_id(199).unwrap()))
 
-    def test_validate_data(self):
+    def test_rank_avg(self):
+        """
+        Test to ensure the average rank matches a full sort of the other students, including after updates
+        """
+        def brute_force(student):
+            averages = sorted(o.calc_average() for o in self.db.get_all().unwrap() if o.get_id() != student.get_id())
+            i = next((i for i, a in enumerate(averages) if a >= student.calc_average()), None)
+            return 1 if i is None else len(self.db) - i
+
+        s = self.db.get_with_id(5).unwrap()
+        self.db.update_student(s.with_mark(1, 0), False)
+        for student in (s, s.with_mark(2, 100), Student(-1, "Test", 1, 5, (100, 100, 100, 100))):
+            assert self.db.get_student_rank_avg(student) == brute_force(student)
+
+    def test_query(self):
+        """
+        Test to ensure paged queries match filtering and sorting the full list of students
+        """
+        students = self.db.get_all().unwrap()
+
+        total, page = self.db.query_students(offset=10, limit=5, sort="epa", descending=True).unwrap()
+        expected = sorted(students, key=lambda s: (s.get_epa(), s.get_id()), reverse=True)[10:15]
+        assert total == len(students)
+        assert [s.get_id() for s in page] == [s.get_id() for s in expected]
+
+        expected = [s for s in students if s.get_class() == 2 and any(t is None for t in s.get_all_tasks())]
+        total, page = self.db.query_students(limit=len(students), sort="name", _c=2, missing=True).unwrap()
+        assert total == len(expected)
+        assert [s.get_name().lower() for s in page] == sorted(s.get_name().lower() for s in expected)
+
+        name = students[0].get_name()
+        total, page = self.db.query_students(search=name[1:4].upper()).unwrap()
+        assert name in [s.get_name() for s in page]
+        assert all(name[1:4].lower() in s.get_name().lower() for s in page)
+
+        # Test to ensure the search follows renamed students
+        s = self.db.get_with_id(3).unwrap()
+        s._name = "Zebedee"
+        self.db.update_student(s, False)
+        total, page = self.db.query_students(search="zebe").unwrap()
+        assert [p.get_id() for p in page] == [3]
+
+        assert self.db.query_students(sort="tasks").is_err()
+
+    def test_students_since(self):
+        """
+        Test to ensure only the students changed after a version are returned, and a reload forces a full resync
+        """
+        version, full, students = self.db.get_students_since(0).unwrap()
+        assert full and len(students) == len(self.db)
+
+        self.db.update_student(self.db.get_with_id(7).unwrap().with_mark(1, 0), False)
+        self.db.update_student(Student(self.db.get_next_id(), "New", 1, 3, (1, 2, 3, 4)), False)
+        self.db.update_student(self.db.get_with_id(2).unwrap().with_mark(1, 0), False)
+        latest, full, students = self.db.get_students_since(version).unwrap()
+        assert not full and latest > version
+        assert [s.get_id() for s in students] == [2, 7, self.db.get_next_id() - 1]
+        assert self.db.get_students_since(latest).unwrap()[2] == []
+
+        self.db.load()
+        assert self.db.get_version() > latest
+        assert self.db.get_students_since(latest).unwrap()[1]
+
+    def test_subset(self):
+        """
+        Test to ensure a subset holds copies of only the requested students
+        """
+        complete = self.db.get_ids(complete_only=True)
+        assert len(complete) < len(self.db.get_ids()) == len(self.db)
+
+        subset = self.db.subset(complete[:10])
+        assert subset.get_ids().tolist() == complete[:10].tolist()
+        student = self.db.get_with_id(int(complete[0])).unwrap()
+        assert subset.get_with_id(student.get_id()).unwrap().get_all_tasks() == student.get_all_tasks()
+
+        subset.update_student(student.with_mark(1, student.get_task(1) + 1), False)
+        assert self.db.get_with_id(student.get_id()).unwrap().get_task(1) == student.get_task(1)
+
+    def test_rank_matrix(self):
         """
-        Test to ensure that the data is valid and consistent. Contains debug print statements to help identify issues.
-        This test will randomly select 20% of the data, generate a mark for each student, and then calculate the error.
+        Test to ensure the rank matrix matches the per-student ranks, and stays up to date as marks change
         """
+        def check():
+            ids, matrix = self.db.get_rank_matrix()
+            for _id, row in zip(ids[:200].tolist(), matrix[:200]):
+                student = self.db.get_with_id(_id).unwrap()
+                expected = [self.db.get_student_rank_task(student, t).unwrap_or(None) for t in range(1, 5)]
+                assert [None if np.isnan(r) else int(r) for r in row] == expected
+                assert self.db.get_student_ranks(student) == expected
+            # Maintained columns match rebuilt ones
+            rebuilt = DB.from_roster(self.db._roster).get_rank_matrix()[1]
+            assert np.array_equal(matrix, rebuilt, equal_nan=True)
 
-        # Split data into two parts: one with test data and the other with valid data
-        # Randomly select 20% of the data for testing.
-        # For each student pick a random task to generate a mark for and then calculate the error
+        check()
+        self.db.update_student(Student(self.db.get_next_id(), "New", 1, 3, (100, None, 50, 0)), False)
+        check()
 
-        train_df, test_df = train_test_split(self.db._file, test_size=0.2, random_state=42)
+        rng = np.random.default_rng(0)
+        for _id in rng.choice(self.db.get_ids(), 30, replace=False).tolist():
+            student = self.db.get_with_id(_id).unwrap()
+            task = int(rng.integers(1, 5))
+            mark = None if rng.random() < 0.3 else int(rng.integers(0, 101))
+            self.db.update_student(student.with_mark(task, mark), False)
+        check()
+
+        ranks, marks = self.db.get_ranked_marks(2).unwrap()
+        assert len(ranks) == len(marks) == self.db.count_marks(2)
+        assert ranks[marks == marks.max()].max() == 1
+        assert self.db.get_nth_best_mark(2, 1).unwrap() == marks.max()
+        assert self.db.get_nth_best_mark(2, len(marks) + 1).is_err()
+
+        ids, matrix = DB("").get_rank_matrix()
+        assert len(ids) == 0 and matrix.shape == (0, 4)
+
+    def test_concurrent_predictions(self):
+        """
+        Test to ensure predictions running alongside edits, like the app's prediction and database threads,
+        never fail and leave the indexes matching the roster
+        """
+        rng = np.random.default_rng(0)
+        for _ in range(10):
+            db = self.db.subset(self.db.get_ids()[:300])
+            ids = db.get_ids().tolist()
+            errors = []
+
+            def predict(seed):
+                r = np.random.default_rng(seed)
+                try:
+                    for _ in range(100):
+                        student = db.get_with_id(int(r.choice(ids))).unwrap()
+                        task = int(r.integers(1, 5))
+                        calculate_mark_cached(db, student.with_mark(task, None), task)
+                except Exception as e:
+                    errors.append(e)
+
+            def edit():
+                try:
+                    for i in range(100):
+                        if i % 10 == 0:
+                            db.update_student(Student(db.get_next_id(), "New", 1, 50, (60, 70, None, 80)), False)
+                            continue
+                        student = db.get_with_id(int(rng.choice(ids))).unwrap()
+                        mark = None if rng.random() < 0.2 else int(rng.integers(0, 101))
+                        db.update_student(student.with_mark(int(rng.integers(1, 5)), mark), False)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=predict, args=(s,)) for s in range(2)] + [threading.Thread(target=edit)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            assert errors == []
+
+            rebuilt = DB.from_roster(db._roster)
+            for task in range(1, 5):
+                assert db._task_index(task)._values == rebuilt._task_index(task)._values
+            assert db._average_index()._values == rebuilt._average_index()._values
+            assert np.array_equal(db.get_rank_matrix()[1], rebuilt.get_rank_matrix()[1], equal_nan=True)
+
+    def test_complete_epa_marks(self):
+        """
+        Test to ensure the cached EPA groups are shared until the marks change
+        """
+        epas, marks = self.db.get_complete_epa_marks(1, 2).unwrap()
+        assert self.db.get_complete_epa_marks(1, 2).unwrap()[1] is marks
+        assert not marks.flags.writeable
+
+        s = self.db.get_all(2, include_invalid=False).unwrap()[0]
+        self.db.update_student(s.with_mark(3, None), False)
+        assert len(self.db.get_complete_epa_marks(1, 2).unwrap()[1]) == len(marks) - 1
+        assert self.db.get_complete_epa_marks(1, -1).is_err()
+
+    def test_concurrent_queries(self):
+        """
+        Test to ensure queries running alongside edits, like the app's database threads, always see whole
+        students and consistent columns
+        """
         errors = []
-        old = []
-        new = []
-
-        for idx, (_, row) in enumerate(test_df.iterrows()):
-            task_id = random.randint(1, 4)
-            student_obj: Student = Student.from_row(row)
-            old_mark = student_obj.get_task(task_id)
-            print(f"Testing student: {row['Student']}, Task: {task_id}, {idx + 1}/{len(test_df)}")
-
-            student_obj.update_mark(task_id, None, override=True)
-            calculated_mark = calculate_mark(self.db, student_obj, task_id)
-
-            # Check % error
-            if calculated_mark.is_ok():
-                new_mark = calculated_mark.unwrap()
-                if old_mark is not None:
-                    smape_error = smape(old_mark, new_mark)
-                    errors.append(smape_error)
-                    print(f"Old mark: {old_mark}, New mark: {new_mark}, SMAPE Error: {smape_error:.2f}%")
-                    print("Marks: " + str([f"{task_id}: {student_obj.get_task(task_id)}" for task_id in range(1, 5)]))
-                    old.append(old_mark)
-                    new.append(new_mark)
-
-
-            else:
-                assert False, f"Error calculating mark for student {student_obj.get_name()}: {calculated_mark.unwrap_err()}"
-            print()
-
-        # Calculate average error
-        avg_error = sum(errors) / len(errors)
-        print(f"Average error: {avg_error:.2f}%")
-        print(f"Max error: {max(errors):.2f}%")
-        print(f"Min error: {min(errors):.2f}%")
-
-        # R2 score of the old vs new marks
-        r2 = r2_score(old, new)
-        print(f"R2 Score: {r2:.2f}")
+        done = threading.Event()
+        s = self.db.get_with_id(1).unwrap()
+
+        def query():
+            try:
+                while not done.is_set():
+                    students = self.db.get_all(include_invalid=False).unwrap()
+                    assert all(None not in st.get_all_tasks() for st in students)
+                    self.db.get_all_with_missing_tasks()
+                    self.db.get_marks_for_task(1, 1)
+                    epas, marks = self.db.get_complete_epa_marks(2).unwrap()
+                    assert len(epas) == len(marks)
+                    ids, matrix = self.db.get_rank_matrix()
+                    assert len(ids) == len(matrix)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=query) for _ in range(2)]
+        for t in threads:
+            t.start()
+        try:
+            for i in range(300):
+                self.db.add_student(s.with_mark(i % 4 + 1, None if i % 2 else i % 101), False)
+        finally:
+            done.set()
+            for t in threads:
+                t.join()
+        assert errors == []
+
+    def test_concurrent_edits(self):
+        """
+        Test to ensure edits of different marks of a student, and new students, added from several threads
+        are all kept
+        """
+        s = self.db.get_with_id(5).unwrap()
+        added = []
+
+        def edit(task):
+            for mark in range(50):
+                assert self.db.set_mark(5, task, mark, False).is_ok()
+            for _ in range(50):
+                added.append(self.db.add_student(s, False))
+
+        threads = [threading.Thread(target=edit, args=(task,)) for task in range(1, 5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert self.db.get_with_id(5).unwrap().get_all_tasks() == (49, 49, 49, 49)
+        assert len(set(added)) == 200
+        assert self.db.get_with_id(max(added)).unwrap().get_all_tasks() == s.get_all_tasks()
+        assert self.db.set_mark(-5, 1, 10, False).is_err()
+
+    def test_validate_data(self):
+        """
+        Test to ensure that the data is valid and consistent.
+        Every mark of a random 20% of the students is hidden and predicted, and the error is checked,
+        see `lib.src.processes.evaluation` for running it over the whole roster. The sample currently
+        scores a SMAPE of 10.8% and an R² of 0.60.
+        """
+        report = evaluate(self.db, "task", students=len(self.db) // 5, workers=1).unwrap()
+        print(format_report(report))
+
+        assert report.failures == 0, f"Errors calculating marks: {report.errors}"
+        assert report.predictions == (len(self.db) // 5) * 4
+        assert sum(s["predictions"] for s in report.by_branch.values()) == report.predictions
+        assert report.smape < 13
+        assert report.r2 > 0.5
 
     def test_consistency(self):
         assert check_consistency_percent([10, 10, 10, 10], 5).unwrap() == True
@@ -0,0 +1,47 @@
+import argparse
+import json
+import sys
+import time
+
+from lib.src.processes.db import DB
+from lib.src.processes.evaluation import MODES, evaluate, format_report
+from lib.src.processes.ml import CONSISTENCY_TOLERANCE, NARROW_SPREAD, TREND_THRESHOLD
+
+"""
+Measure the prediction accuracy of `calculate_mark` on a roster CSV, e.g. one written by data.py, to tune
+its thresholds:
+
+    python evaluate.py students_marks.csv                               # leave one task out
+    python evaluate.py big.csv --mode kfold --folds 5 --students 10000   # 5-fold on a sample
+    python evaluate.py big.csv --trend 15 --consistency 8                # other thresholds
+"""
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Evaluate the mark predictions on a roster.")
+    parser.add_argument("path", help="roster CSV")
+    parser.add_argument("--mode", choices=MODES, default="task", help="leave one task out, or k-fold over students")
+    parser.add_argument("--folds", type=int, default=5, help="number of folds in kfold mode")
+    parser.add_argument("--students", type=int, default=None, help="number of students to sample, all if not set")
+    parser.add_argument("--seed", type=int, default=42, help="random seed for the sample and folds")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, one per CPU if not set")
+    parser.add_argument("--consistency", type=float, default=CONSISTENCY_TOLERANCE, help="consistency tolerance (%%)")
+    parser.add_argument("--trend", type=float, default=TREND_THRESHOLD, help="trend threshold (ranks per task)")
+    parser.add_argument("--spread", type=float, default=NARROW_SPREAD, help="narrow spread (%% of students)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    db = DB(args.path)
+    start = time.perf_counter()
+    result = evaluate(db, args.mode, args.folds, args.students, args.seed, args.workers,
+                      consistency_tolerance=args.consistency, trend_threshold=args.trend, narrow_spread=args.spread)
+    if result.is_err():
+        print(result.unwrap_err())
+        sys.exit(1)
+
+    report = result.unwrap()
+    if args.json:
+        print(json.dumps(report._asdict(), indent=2))
+    else:
+        print(format_report(report))
+        print(f"  {time.perf_counter() - start:.1f} s")
+    db.close()
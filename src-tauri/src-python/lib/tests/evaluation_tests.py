@@ -0,0 +1,88 @@
+import unittest
+
+from lib.src.processes.db import DB
+from lib.src.processes.evaluation import evaluate, format_report, _evaluate_students
+from lib.src.processes.ml import calculate_mark
+from lib.src.processes.tracing import tracer
+
+"""
+This file contains tests for the prediction accuracy evaluation.
+"""
+class TestEvaluation(unittest.TestCase):
+    def setUp(self):
+        self.db = DB("./students_marks.csv")
+
+    def test_task(self):
+        """
+        Test to ensure every mark of the sampled students is predicted, and the pool gives the same report
+        as predicting in this process
+        """
+        version = self.db.get_version()
+        serial = evaluate(self.db, "task", students=60, workers=1).unwrap()
+        assert self.db.get_version() == version
+        assert serial.predictions + serial.failures == 240
+        assert sum(s["predictions"] for s in serial.by_branch.values()) == serial.predictions
+        assert sum(s["predictions"] for s in serial.by_task.values()) == serial.predictions
+        assert list(serial.by_task) == [1, 2, 3, 4]
+        assert 0 < serial.smape < 100 and serial.mae > 0
+
+        pooled = evaluate(self.db, "task", students=60, workers=2, chunk_size=8).unwrap()
+        assert pooled == serial
+
+    def test_hidden_mark(self):
+        """
+        Test to ensure a mark is predicted against a roster it has been cleared from, and the roster is
+        left as it was
+        """
+        against = self.db.subset(self.db.get_ids())
+        ids = self.db.get_ids(complete_only=True)[:5].tolist()
+        results = _evaluate_students(self.db, against, ids, {})
+
+        for _id, task, mark, predicted, _ in results:
+            student = self.db.get_with_id(_id).unwrap()
+            expected = self.db.subset(self.db.get_ids())
+            expected.update_student(student.with_mark(task, None), False)
+            assert predicted == calculate_mark(expected, student.with_mark(task, None), task).unwrap()
+            assert against.get_with_id(_id).unwrap().get_task(task) == mark
+
+    def test_kfold(self):
+        """
+        Test to ensure k-fold evaluation predicts against the other folds, giving different results
+        """
+        task = evaluate(self.db, "task", students=60, workers=1).unwrap()
+        kfold = evaluate(self.db, "kfold", folds=3, students=60, workers=1).unwrap()
+        assert kfold.mode == "kfold"
+        assert kfold.predictions + kfold.failures == 240
+        assert kfold != task._replace(mode="kfold")
+
+        pooled = evaluate(self.db, "kfold", folds=3, students=60, workers=2, chunk_size=8).unwrap()
+        assert pooled == kfold
+
+    def test_thresholds(self):
+        """
+        Test to ensure thresholds are passed on to calculate_mark
+        """
+        report = evaluate(self.db, "task", students=20, workers=1, consistency_tolerance=1000).unwrap()
+        assert list(report.by_branch) == ["consistent_rank"]
+        assert "consistent_rank" in format_report(report)
+
+    def test_app_traces_kept(self):
+        """
+        Test to ensure an evaluation neither clears nor adds to the traces collected by the app
+        """
+        with tracer.tracing():
+            student = self.db.get_with_id(1).unwrap()
+            calculate_mark(self.db, student.with_mark(1, None), 1).unwrap()
+            histogram, traces = tracer.histogram(), tracer.traces()
+
+            evaluate(self.db, "task", students=10, workers=1).unwrap()
+            assert tracer.enabled
+            assert tracer.histogram() == histogram
+            assert tracer.traces() == traces
+
+    def test_errors(self):
+        assert evaluate(self.db, "unknown").is_err()
+
+
+if __name__ == '__main__':
+    unittest.main()
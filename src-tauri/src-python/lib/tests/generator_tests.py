@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from lib.src.processes.db import DB
+from lib.tests.data import generate, truncated_normal
+
+"""
+This file contains tests for the synthetic roster generator in data.py.
+"""
+class TestGenerator(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "roster.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_generate(self):
+        """
+        Test to ensure the generated roster has the requested shape, valid values and missing rate
+        """
+        generate(self.path, 5_000, class_size=20, missing=0.1, chunk_size=1_000)
+        df = pd.read_csv(self.path)
+
+        assert len(df) == 5_000
+        assert df["id"].tolist() == list(range(5_000))
+        assert list(df.columns[-4:]) == ["Task 1", "Task 2", "Task 3", "Task 4"]
+        assert (df["Class"].value_counts() == 20).all()
+        assert df["Class"].nunique() == 250
+        assert df["EPA Score"].between(0, 5).all()
+
+        marks = df[["Task 1", "Task 2", "Task 3", "Task 4"]]
+        assert ((marks >= 0) & (marks <= 100) | marks.isna()).all().all()
+        assert 0.08 < marks.isna().mean().mean() < 0.12
+        # Later tasks are harder
+        assert marks["Task 1"].mean() > marks["Task 4"].mean()
+
+    def test_deterministic(self):
+        """
+        Test to ensure the same seed and chunk size produce the same roster, and another seed doesn't
+        """
+        generate(self.path, 1_000, missing=0.05, chunk_size=300)
+        other = os.path.join(self.folder, "other.csv")
+        generate(other, 1_000, missing=0.05, chunk_size=300)
+        assert pd.read_csv(self.path).equals(pd.read_csv(other))
+
+        generate(other, 1_000, missing=0.05, chunk_size=300, seed=7)
+        assert not pd.read_csv(self.path).equals(pd.read_csv(other))
+
+    def test_tasks(self):
+        """
+        Test to ensure any number of tasks can be generated
+        """
+        generate(self.path, 100, tasks=6)
+        df = pd.read_csv(self.path)
+        assert [c for c in df.columns if c.startswith("Task")] == [f"Task {i}" for i in range(1, 7)]
+
+    def test_loads(self):
+        """
+        Test to ensure the generated roster loads into the database
+        """
+        generate(self.path, 2_000, missing=0.05, chunk_size=500)
+        db = DB(self.path)
+        assert len(db.get_all().unwrap()) == 2_000
+        assert 0 < len(db.get_all_with_missing_tasks().unwrap()) < 2_000
+        db.close()
+
+    def test_truncated_normal(self):
+        """
+        Test to ensure samples stay in range, even for means far outside it
+        """
+        rng = np.random.default_rng(1)
+        values = truncated_normal(rng, np.array([[-50.0, 50.0], [150.0, 99.0]]), 5, 0, 100)
+        assert values.shape == (2, 2)
+        assert ((values >= 0) & (values <= 100)).all()
+        assert values[0, 0] == 0 and values[1, 0] == 100
+
+
+if __name__ == '__main__':
+    unittest.main()
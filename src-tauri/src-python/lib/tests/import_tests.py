@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+import unittest
+
+"""
+This file contains import-time budget checks for the application entry point.
+
+Run it directly to print a `python -X importtime` report of the slowest imports:
+
+    python import_tests.py [module]
+"""
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# Modules that must only be imported when first used
+HEAVY_MODULES = ["numpy", "pandas", "sklearn", "matplotlib"]
+
+# Budget for importing the entry point, in microseconds
+ENTRY_POINT_BUDGET_US = 500_000
+
+
+def import_time(module: str) -> subprocess.CompletedProcess:
+    """
+    Import a module in a fresh interpreter with `-X importtime`.
+
+    Args:
+        module: Module to import
+
+    Returns:
+        subprocess.CompletedProcess: The finished process, the report is in stderr
+    """
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+    )
+
+
+def parse_report(report: str) -> dict[str, int]:
+    """
+    Parse a `-X importtime` report.
+
+    Args:
+        report: The stderr of the interpreter
+
+    Returns:
+        dict[str, int]: Cumulative import time in microseconds per module
+    """
+    times = {}
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestImports(unittest.TestCase):
+    def assert_lazy(self, module: str) -> dict[str, int]:
+        result = import_time(module)
+        if result.returncode != 0:
+            self.skipTest(f"{module} can't be imported here: {result.stderr.strip().splitlines()[-1]}")
+
+        times = parse_report(result.stderr)
+        loaded = [m for m in HEAVY_MODULES if m in times]
+        assert not loaded, f"Importing {module} also imports {loaded}"
+        return times
+
+    def test_entry_point(self):
+        """
+        Test to ensure the Tauri entry point doesn't import the analytics stack and stays within its budget
+        """
+        times = self.assert_lazy("mltasktauri")
+        assert times["mltasktauri"] <= ENTRY_POINT_BUDGET_US, f"Importing mltasktauri took {times['mltasktauri']}us"
+
+    def test_students(self):
+        """
+        Test to ensure the Student record doesn't import the analytics stack
+        """
+        self.assert_lazy("lib.src.struct.students")
+
+    def test_regression(self):
+        """
+        Test to ensure plotting is only imported when a plot is requested
+        """
+        times = parse_report(import_time("lib.src.processes.regression").stderr)
+        assert "matplotlib" not in times
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        times = parse_report(import_time(sys.argv[1]).stderr)
+        for name, cumulative in sorted(times.items(), key=lambda t: -t[1])[:25]:
+            print(f"{cumulative / 1000:10.1f} ms  {name}")
+    else:
+        unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from lib.src.processes.db import DB
+from lib.src.processes.ml import impute_missing
+from lib.src.processes.shared_roster import attach_roster
+
+"""
+This file contains tests for imputing every missing mark across a pool of processes.
+"""
+class TestImpute(unittest.TestCase):
+    def setUp(self):
+        self.db = DB("./students_marks.csv")
+
+    def test_shared_roster(self):
+        """
+        Test to ensure a roster attached from shared memory answers queries like the original
+        """
+        shm, layout = self.db.share()
+        try:
+            attached, roster = attach_roster(shm.name, layout)
+            shared = DB.from_roster(roster)
+            s = self.db.get_with_id(3).unwrap()
+            assert shared.get_with_id(3).unwrap().get_all_tasks() == s.get_all_tasks()
+            assert shared.get_student_rank_avg(s) == self.db.get_student_rank_avg(s)
+            del roster, shared
+            attached.close()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def test_from_roster_never_saves(self):
+        """
+        Test to ensure saving a change to a database without a file only changes it in memory
+        """
+        shared = DB.from_roster(self.db._roster.select(slice(0, 20)))
+        s = shared.get_with_id(3).unwrap().with_mark(1, 7)
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            # A path of "" resolves to the working directory, next to which the CSV would be written
+            os.mkdir(os.path.join(tmp, "cwd"))
+            os.chdir(os.path.join(tmp, "cwd"))
+            try:
+                shared.update_student(s)
+                shared.flush()
+                shared.close()
+            finally:
+                os.chdir(cwd)
+            assert os.listdir(tmp) == ["cwd"]
+        assert shared.get_with_id(3).unwrap().get_task(1) == 7
+
+    def test_deterministic(self):
+        """
+        Test to ensure the pool calculates the same marks as a single process, in the same order
+        """
+        for _id in range(10, 50):
+            s = self.db.get_with_id(_id).unwrap()
+            self.db.update_student(s.with_mark(_id % 4 + 1, None), False)
+
+        serial = impute_missing(self.db, workers=1).unwrap()
+        pooled = impute_missing(self.db, workers=2, chunk_size=8).unwrap()
+
+        missing = self.db.get_all_with_missing_tasks().unwrap()
+        assert len(serial) == sum(s.get_all_tasks().count(None) for s in missing)
+        assert list(serial) == sorted(serial)
+        assert list(pooled) == list(serial)
+        assert [r.unwrap_or(None) for r in pooled.values()] == [r.unwrap_or(None) for r in serial.values()]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.src.processes import db as db_module
+from lib.src.processes.db import DB
+
+"""
+This file contains tests for journaling edits instead of rewriting the roster CSV.
+"""
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "students_marks.csv")
+        shutil.copy("./students_marks.csv", self.path)
+        self.db = DB(self.path)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.dir)
+
+    def test_replay(self):
+        """
+        Test to ensure journaled edits survive a reload without rewriting the CSV
+        """
+        with open(self.path) as f:
+            original = f.read()
+
+        s = self.db.get_with_id(1).unwrap()
+        self.db.update_student(s.with_mark(2, 12))
+        s._name = "hmm"
+        self.db.update_student(s)
+        self.db.update_student(s.with_mark(1, None).with_mark(3, 0))
+        assert len(self.db._journal) == 3
+
+        with open(self.path) as f:
+            assert f.read() == original
+
+        reloaded = DB(self.path)
+        assert reloaded.get_with_id(1).unwrap().get_all_tasks() == (None, s.get_task(2), 0, s.get_task(4))
+        assert reloaded.get_with_id(1).unwrap().get_name() == "hmm"
+
+    def test_compact(self):
+        """
+        Test to ensure the journal is written back into the CSV once it holds enough edits, on flush and
+        on close, but not after every edit
+        """
+        for mark in range(3):
+            self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(1, mark))
+        assert self.db._saver._first is None
+
+        threshold = db_module.JOURNAL_COMPACT_THRESHOLD
+        db_module.JOURNAL_COMPACT_THRESHOLD = 5
+        try:
+            for mark in range(3):
+                self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(1, mark))
+            assert self.db._saver._first is not None
+        finally:
+            db_module.JOURNAL_COMPACT_THRESHOLD = threshold
+
+        for mark in range(3):
+            self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(1, mark))
+        self.db.flush()
+
+        assert len(self.db._journal) == 0
+        assert not os.path.exists(self.db._journal.get_path())
+        assert not self.db.is_stale()
+        assert DB(self.path).get_with_id(1).unwrap().get_task(1) == 2
+
+        self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(1, 50))
+        self.db.close()
+        assert not os.path.exists(self.db._journal.get_path())
+        assert DB(self.path).get_with_id(1).unwrap().get_task(1) == 50
+
+    def test_rotate(self):
+        """
+        Test to ensure edits made while the CSV is being written are kept in a fresh journal
+        """
+        journal = self.db._journal
+        self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(1, 1))
+        journal.rotate()
+        self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(2, 2))
+
+        assert [e["task"] for e in journal.read()] == [1, 2]
+        journal.discard_rotated()
+        assert [e["task"] for e in journal.read()] == [2]
+
+    def test_torn_write(self):
+        """
+        Test to ensure a partially written entry is ignored
+        """
+        self.db.update_student(self.db.get_with_id(1).unwrap().with_mark(1, 7))
+        with open(self.db._journal.get_path(), "a") as f:
+            f.write('{"op": "mark", "id": 1, "ta')
+
+        assert DB(self.path).get_with_id(1).unwrap().get_task(1) == 7
+
+
+if __name__ == '__main__':
+    unittest.main()
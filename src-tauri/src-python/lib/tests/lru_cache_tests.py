@@ -0,0 +1,62 @@
+import unittest
+
+from lib.src.processes.db import DB
+from lib.src.processes.ml import calculate_mark, calculate_mark_cached, prediction_cache
+from lib.src.struct.lru_cache import LRUCache
+
+"""
+This file contains tests for the LRU cache and the mark predictions cached in it.
+"""
+class TestLRUCache(unittest.TestCase):
+    def test_eviction(self):
+        """
+        Test to ensure the least recently used entry is evicted first and lookups are counted
+        """
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.stats() == {"hits": 3, "misses": 1, "size": 2, "maxsize": 2}
+
+
+class TestPredictionCache(unittest.TestCase):
+    def setUp(self):
+        self.db = DB("./students_marks.csv")
+        prediction_cache.clear()
+
+    def test_hits(self):
+        """
+        Test to ensure repeated predictions are served from the cache and match uncached ones
+        """
+        s = self.db.get_with_id(5).unwrap().with_mark(2, None)
+        hits = prediction_cache.hits
+        mark = calculate_mark_cached(self.db, s, 2).unwrap()
+        assert calculate_mark_cached(self.db, s, 2).unwrap() == mark == calculate_mark(self.db, s, 2).unwrap()
+        assert prediction_cache.hits == hits + 1
+
+        # Renaming a student doesn't affect predictions
+        renamed = self.db.get_with_id(6).unwrap()
+        renamed._name = "Renamed"
+        self.db.update_student(renamed, False)
+        calculate_mark_cached(self.db, s, 2)
+        assert prediction_cache.hits == hits + 2
+
+    def test_invalidation(self):
+        """
+        Test to ensure changing any mark invalidates the cached predictions
+        """
+        s = self.db.get_with_id(5).unwrap().with_mark(2, None)
+        calculate_mark_cached(self.db, s, 2)
+        misses = prediction_cache.misses
+
+        other = self.db.get_with_id(6).unwrap()
+        self.db.update_student(other.with_mark(1, other.get_task(1) + 1), False)
+        assert calculate_mark_cached(self.db, s, 2).unwrap() == calculate_mark(self.db, s, 2).unwrap()
+        assert prediction_cache.misses == misses + 1
+
+
+if __name__ == '__main__':
+    unittest.main()
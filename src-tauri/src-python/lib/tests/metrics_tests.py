@@ -0,0 +1,94 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from importlib.util import spec_from_file_location, module_from_spec
+from inspect import signature
+
+from pydantic import BaseModel, RootModel
+
+"""
+This file contains tests for the per-command metrics.
+"""
+
+# Load the module on its own, importing the mltasktauri package would start loading Tauri
+_spec = spec_from_file_location(
+    "mltasktauri_metrics",
+    os.path.join(os.path.dirname(__file__), "..", "..", "mltasktauri", "metrics.py"),
+)
+metrics = module_from_spec(_spec)
+_spec.loader.exec_module(metrics)
+
+
+class FakeCommands:
+    """Records registered handlers like `pytauri.Commands`."""
+    def __init__(self):
+        self.handlers = {}
+
+    def command(self, name):
+        def register(func):
+            self.handlers[name] = func
+            return func
+        return register
+
+
+class Body(BaseModel):
+    n: int
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.metrics.reset()
+        self.commands = FakeCommands()
+        _commands = metrics.InstrumentedCommands(self.commands)
+
+        @_commands.command()
+        async def numbers(body: Body) -> RootModel[list[int]]:
+            with metrics.phase("load"):
+                time.sleep(0.01)
+            return RootModel(list(range(body.n)))
+
+        @_commands.command("broken")
+        async def fails() -> bytes:
+            raise ValueError("broken")
+
+    def test_record(self):
+        """
+        Test to ensure calls are serialized by the wrapper and recorded per phase
+        """
+        handler = self.commands.handlers["numbers"]
+        assert signature(handler).return_annotation is bytes
+        assert asyncio.run(handler(body=Body(n=3))) == b"[0,1,2]"
+        with self.assertRaises(ValueError):
+            asyncio.run(self.commands.handlers["broken"]())
+
+        snapshot = metrics.metrics.snapshot()
+        numbers = snapshot["numbers"]
+        assert numbers["calls"] == 1 and numbers["errors"] == 0
+        assert numbers["latency"]["load"]["total"] >= 0.01
+        assert numbers["latency"]["compute"]["total"] < numbers["latency"]["load"]["total"]
+        assert numbers["payload"]["total"] == len(b"[0,1,2]")
+        assert snapshot["broken"]["errors"] == 1
+
+    def test_dump(self):
+        """
+        Test to ensure the snapshot is written to disk
+        """
+        asyncio.run(self.commands.handlers["numbers"](body=Body(n=1)))
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, "metrics.json")
+            dumper = metrics.MetricsDumper(path, 0.01).start()
+            time.sleep(0.05)
+            dumper.stop()
+            with open(path) as f:
+                assert json.load(f)["commands"]["numbers"]["calls"] == 1
+        finally:
+            shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
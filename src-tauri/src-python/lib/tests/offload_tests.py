@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+import unittest
+from importlib.util import spec_from_file_location, module_from_spec
+
+import anyio
+
+"""
+This file contains tests for running blocking command work in worker threads.
+"""
+
+# Load the module on its own, importing the mltasktauri package would start loading Tauri
+_spec = spec_from_file_location(
+    "mltasktauri_offload",
+    os.path.join(os.path.dirname(__file__), "..", "..", "mltasktauri", "offload.py"),
+)
+offload = module_from_spec(_spec)
+_spec.loader.exec_module(offload)
+
+
+class TestOffload(unittest.TestCase):
+    def setUp(self):
+        self.limits = offload.get_limits()
+
+    def tearDown(self):
+        offload.configure_limits(**self.limits)
+
+    def test_limits(self):
+        """
+        Test to ensure predictions are limited separately and never block the event loop or database work
+        """
+        offload.configure_limits(prediction=1)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def predict():
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.1)
+            with lock:
+                running.pop()
+            return threading.current_thread()
+
+        async def main():
+            ticks = 0
+            database_done = anyio.Event()
+
+            async def ticker():
+                nonlocal ticks
+                while not database_done.is_set():
+                    ticks += 1
+                    await anyio.sleep(0.01)
+
+            async def database():
+                await anyio.sleep(0.02)
+                await offload.run_database(time.sleep, 0.01)
+                database_done.set()
+
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(ticker)
+                tg.start_soon(database)
+                for _ in range(3):
+                    tg.start_soon(offload.run_prediction, predict)
+                start = time.monotonic()
+                await database_done.wait()
+                # The database work didn't wait for the queued predictions
+                assert time.monotonic() - start < 0.25
+            return ticks
+
+        assert anyio.run(main) >= 2
+        assert max(peak) == 1
+
+    def test_configure(self):
+        """
+        Test to ensure invalid limits are clamped and unset ones are kept
+        """
+        offload.configure_limits(database=0)
+        assert offload.get_limits() == {**self.limits, "database": 1}
+
+
+if __name__ == '__main__':
+    unittest.main()
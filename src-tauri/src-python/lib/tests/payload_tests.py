@@ -0,0 +1,89 @@
+import json
+import sys
+import time
+import unittest
+
+from lib.src.processes.db import DB
+
+"""
+This file contains tests for the columnar student payload, and a benchmark against the per-student models.
+
+Run it directly to print the benchmark for a roster:
+
+    python payload_tests.py [path/to/roster.csv]
+"""
+
+
+def benchmark(db: DB) -> dict[str, tuple[int, float]]:
+    """
+    Serialize every student with both the per-student models and the columnar payload.
+
+    Args:
+        db: The database to serialize
+
+    Returns:
+        dict[str, tuple[int, float]]: Payload size in bytes and time in seconds per path
+
+    Raises:
+        ImportError, RuntimeError: If the application commands can't be imported, e.g. outside of the Tauri build
+    """
+    from mltasktauri import PYStudent
+    from pydantic import RootModel
+
+    start = time.perf_counter()
+    models = RootModel([PYStudent.from_student(s) for s in db.get_all().unwrap()]).model_dump_json().encode()
+    models_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = db.get_columns().unwrap()
+    columns_time = time.perf_counter() - start
+    return {"models": (len(models), models_time), "columns": (len(columns), columns_time)}
+
+
+class TestPayload(unittest.TestCase):
+    def setUp(self):
+        self.db = DB("./students_marks.csv")
+
+    def test_round_trip(self):
+        """
+        Test to ensure the columns hold the same students as the per-student path
+        """
+        students = self.db.get_all().unwrap()
+        columns = json.loads(self.db.get_columns().unwrap())
+        assert columns["ids"] == sorted(s.get_id() for s in students)
+
+        decoded = {
+            _id: (columns["names"][i], columns["class_id"][i], columns["epa"][i], [t[i] for t in columns["tasks"]])
+            for i, _id in enumerate(columns["ids"])
+        }
+        for s in students:
+            assert decoded[s.get_id()] == (s.get_name(), s.get_class(), s.get_epa(), list(s.get_all_tasks()))
+
+    def test_filters(self):
+        """
+        Test to ensure only students with missing tasks are sent when asked
+        """
+        expected = [s.get_id() for s in self.db.get_all_with_missing_tasks().unwrap()]
+        columns = json.loads(self.db.get_columns(missing_only=True).unwrap())
+        assert columns["ids"] == sorted(expected)
+        assert all(None in [t[i] for t in columns["tasks"]] for i in range(len(expected)))
+
+    def test_benchmark(self):
+        """
+        Test to ensure the columnar payload is smaller and faster to build than the per-student models
+        """
+        try:
+            results = benchmark(self.db)
+        except (ImportError, RuntimeError) as e:
+            self.skipTest(f"mltasktauri can't be imported here: {e}")
+
+        assert results["columns"][0] < results["models"][0]
+        assert results["columns"][1] < results["models"][1]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and not sys.argv[1].startswith("-"):
+        for path, (size, seconds) in benchmark(DB(sys.argv[1])).items():
+            print(f"{path:>8}: {size / 1024:10.1f} KiB  {seconds * 1000:8.1f} ms")
+    else:
+        unittest.main()
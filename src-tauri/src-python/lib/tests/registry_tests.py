@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from lib.src.processes.registry import DBRegistry
+
+"""
+This file contains tests for the shared DB registry used by the Tauri commands.
+"""
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "students_marks.csv")
+        shutil.copy("./students_marks.csv", self.path)
+        self.registry = DBRegistry()
+
+    def tearDown(self):
+        self.registry.close_all()
+        shutil.rmtree(self.dir)
+
+    def test_cached(self):
+        """
+        Test to ensure the same file returns the same database until it changes
+        """
+        db = self.registry.get(self.path)
+        assert self.registry.get(os.path.join(self.dir, ".", "students_marks.csv")) is db
+        assert len(self.registry) == 1
+
+    def test_own_write(self):
+        """
+        Test to ensure saves made through the database don't trigger a reload
+        """
+        db = self.registry.get(self.path)
+        s = db.get_with_id(1).unwrap()
+        s._name = "hmm"
+        db.update_student(s)
+
+        assert not db.is_stale()
+        assert self.registry.get(self.path).get_with_id(1).unwrap().get_name() == "hmm"
+
+    def test_external_write(self):
+        """
+        Test to ensure the database is reloaded when the file is changed by someone else
+        """
+        db = self.registry.get(self.path)
+        with open(self.path) as f:
+            lines = f.readlines()
+        with open(self.path, "w") as f:
+            f.writelines(lines[:11])
+
+        assert db.is_stale()
+        assert len(self.registry.get(self.path)) == 10
+
+    def test_failed_reload(self):
+        """
+        Test to ensure a database that can't be reloaded is closed before it is dropped
+        """
+        db = self.registry.get(self.path)
+        os.remove(self.path)
+
+        with self.assertRaises(RuntimeError):
+            self.registry.get(self.path)
+        assert len(self.registry) == 0
+        assert db._saver._closed
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from lib.src.processes.regression import linear_regression_batch, linear_regression_1d, smape, smape_batch
+
+"""
+This file contains tests for the closed-form regression engine, using scikit-learn as the reference.
+"""
+class TestRegression(unittest.TestCase):
+    def test_matches_sklearn(self):
+        """
+        Test to ensure a masked batch of fits gives the same results as fitting each problem with scikit-learn
+        """
+        rng = np.random.default_rng(0)
+        x = rng.uniform(0, 5, (20, 30))
+        y = 10 * x + rng.normal(50, 5, (20, 30))
+        mask = rng.random((20, 30)) < 0.8
+        predict = rng.uniform(0, 5, (20, 3))
+
+        fit = linear_regression_batch(x, y, predict, mask)
+        for i in range(20):
+            model = LinearRegression().fit(x[i, mask[i]].reshape(-1, 1), y[i, mask[i]])
+            assert np.isclose(fit.slope[i], model.coef_[0])
+            assert np.isclose(fit.intercept[i], model.intercept_)
+            assert np.allclose(fit.prediction[i], model.predict(predict[i].reshape(-1, 1)))
+            assert np.isclose(fit.r2[i], r2_score(y[i, mask[i]], model.predict(x[i, mask[i]].reshape(-1, 1))))
+
+    def test_degenerate(self):
+        """
+        Test to ensure constant inputs behave like scikit-learn
+        """
+        fit = linear_regression_batch([[2, 2, 2], [1, 2, 3]], [[1, 2, 3], [5, 5, 5]], [[10], [10]])
+        assert np.allclose(fit.slope, [0, 0])
+        assert np.allclose(fit.prediction[:, 0], [2, 5])
+        assert np.allclose(fit.r2, [0, 1])
+
+    def test_1d(self):
+        """
+        Test to ensure the single problem wrapper still returns a list of predictions
+        """
+        assert np.allclose(linear_regression_1d([1, 2, 3], [2, 4, 6], [4, 5]), [8, 10])
+
+    def test_smape_batch(self):
+        """
+        Test to ensure the batched SMAPE matches the scalar one
+        """
+        y_true = [50, 0, 100, 10]
+        y_pred = [60, 0, 90, 0]
+        assert np.allclose(smape_batch(y_true, y_pred), [smape(t, p) for t, p in zip(y_true, y_pred)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+import numpy as np
+from importlib.util import find_spec
+
+from lib.src.struct.roster import Roster, read_csv
+from lib.src.struct.students import Student
+
+"""
+This file contains tests for the columnar Roster storage used by the DB class.
+"""
+class TestRoster(unittest.TestCase):
+    def setUp(self):
+        self.roster = Roster.from_students([
+            Student(1, "A", 1, 2.5, [50, None, 70, 80]),
+            Student(2, "B", 2, 4.0, [90, 95, 100, None]),
+        ])
+
+    def test_round_trip(self):
+        """
+        Test to ensure rows are materialised with the values they were stored with
+        """
+        s = self.roster.student_at(0)
+        assert s.get_id() == 1 and s.get_name() == "A" and s.get_class() == 1
+        assert s.get_all_tasks() == (50, None, 70, 80)
+
+        # Materialised students don't share state with the roster
+        s.update_mark(2, 60)
+        assert self.roster.student_at(0).get_task(2) is None
+
+    def test_ranks(self):
+        """
+        Test to ensure ranks match the sorted index, with ties sharing the best rank and NaN for missing marks
+        """
+        for i, marks in enumerate([[90, 80], [80, 80], [70, None], [80, 60]], start=3):
+            self.roster.append(Student(i, str(i), 1, 1.0, [marks[0], marks[1], 1, 1]))
+
+        assert np.array_equal(self.roster.ranks(1), [6, 1, 1, 3, 5, 3], equal_nan=True)
+        assert np.array_equal(self.roster.ranks(2), [np.nan, 1, 2, 2, np.nan, 4], equal_nan=True)
+        assert np.isnan(Roster.empty().ranks(1)).all()
+
+    def test_append(self):
+        """
+        Test to ensure appending grows the arrays without losing rows
+        """
+        for i in range(3, 40):
+            assert self.roster.append(Student(i, str(i), 1, 1.0, [i, i, i, None])) == i - 1
+
+        assert len(self.roster) == 39
+        assert self.roster.ids.tolist() == list(range(1, 40))
+        assert self.roster.student_at(38).get_all_tasks() == (39, 39, 39, None)
+
+    def test_position(self):
+        """
+        Test to ensure the id index and max id follow appends and id changes
+        """
+        assert self.roster.position(2) == 1
+        assert self.roster.position(3) is None
+
+        self.roster.append(Student(10, "C", 1, 1.0, [1, 2, 3, 4]))
+        assert self.roster.position(10) == 2
+        assert self.roster.max_id == 10
+
+        self.roster.set_row(0, Student(20, "A", 1, 2.5, [50, None, 70, 80]))
+        assert self.roster.position(1) is None
+        assert self.roster.position(20) == 0
+        assert self.roster.max_id == 20
+
+    def test_averages(self):
+        """
+        Test to ensure averages ignore missing marks
+        """
+        assert np.allclose(self.roster.averages(), [200 / 3, 95])
+
+    def test_from_frame(self):
+        """
+        Test to ensure the bulk CSV conversion keeps missing marks and sorts rows by id
+        """
+        roster = Roster.from_frame(read_csv("./students_marks.csv", engine="c"))
+        assert len(roster) == 1000
+        assert (np.diff(roster.ids) > 0).all()
+        assert roster.student_at(3).get_all_tasks() == (79, 74, 80, None)
+        assert roster.missing.any()
+
+    @unittest.skipIf(find_spec("pyarrow") is None, "pyarrow is not installed")
+    def test_pyarrow_engine(self):
+        """
+        Test to ensure both CSV engines produce the same roster
+        """
+        c = Roster.from_frame(read_csv("./students_marks.csv", engine="c"))
+        arrow = Roster.from_frame(read_csv("./students_marks.csv", engine="pyarrow"))
+        for column in ("ids", "names", "classes", "epas", "marks", "missing"):
+            assert (getattr(c, column) == getattr(arrow, column)).all()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from lib.src.processes.saver import WriteBehind, write_temp_file
+
+"""
+This file contains tests for the background saver and atomic file writes.
+"""
+class TestSaver(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.saved = threading.Event()
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def save(self):
+        self.calls += 1
+        self.saved.set()
+
+    def test_coalesce(self):
+        """
+        Test to ensure a burst of requests results in a single save once the requests stop
+        """
+        saver = WriteBehind(self.save, delay=0.05, max_delay=5)
+        for _ in range(50):
+            saver.schedule()
+        assert self.saved.wait(2)
+        time.sleep(0.1)
+        assert self.calls == 1
+        assert not saver.is_pending()
+        saver.close()
+
+    def test_flush(self):
+        """
+        Test to ensure flush saves a pending request straight away, and does nothing otherwise
+        """
+        saver = WriteBehind(self.save, delay=60, max_delay=60)
+        saver.flush()
+        assert self.calls == 0
+
+        saver.schedule()
+        saver.flush()
+        assert self.calls == 1
+        saver.close()
+        assert self.calls == 1
+
+    def test_failed_save(self):
+        """
+        Test to ensure a failed save stays pending and is raised by flush
+        """
+        def fail():
+            raise OSError("disk full")
+
+        saver = WriteBehind(fail, delay=60, max_delay=60)
+        saver.schedule()
+        self.assertRaises(OSError, saver.flush)
+        assert saver.is_pending()
+
+    def test_atomic_write(self):
+        """
+        Test to ensure a failed write leaves the original file untouched and no temporary files behind
+        """
+        path = os.path.join(self.dir, "roster.csv")
+        with open(path, "w") as f:
+            f.write("original")
+
+        def fail(f):
+            f.write("partial")
+            raise OSError("disk full")
+
+        self.assertRaises(OSError, write_temp_file, path, fail)
+        assert os.listdir(self.dir) == ["roster.csv"]
+
+        os.replace(write_temp_file(path, lambda f: f.write("new")), path)
+        with open(path) as f:
+            assert f.read() == "new"
+        assert os.listdir(self.dir) == ["roster.csv"]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+
+from lib.src.processes.db import DB
+
+"""
+This file contains tests for the binary sidecar cache of roster CSVs.
+"""
+class TestSidecar(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "students_marks.csv")
+        shutil.copy("./students_marks.csv", self.path)
+        self.cache = self.path + ".cache"
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_memory_mapped(self):
+        """
+        Test to ensure the second open maps the cache and matches the parsed CSV
+        """
+        parsed = DB(self.path, sidecar=True)
+        assert len(os.listdir(self.cache)) == 1
+
+        cached = DB(self.path, sidecar=True)
+        assert isinstance(cached._roster.marks, np.memmap)
+        for column in ("ids", "names", "classes", "epas", "marks", "missing"):
+            assert (getattr(parsed._roster, column) == getattr(cached._roster, column)).all()
+        assert cached.get_with_id(3).unwrap().get_all_tasks() == parsed.get_with_id(3).unwrap().get_all_tasks()
+
+    def test_changes_stay_in_memory(self):
+        """
+        Test to ensure editing a mapped roster never writes to the cache
+        """
+        DB(self.path, sidecar=True)
+        db = DB(self.path, sidecar=True)
+        s = db.get_with_id(1).unwrap()
+        s._name = "A much longer name than any of the generated ones"
+        db.update_student(s.with_mark(1, 0), False)
+
+        assert db.get_with_id(1).unwrap().get_name() == s.get_name()
+        assert DB(self.path, sidecar=True).get_with_id(1).unwrap().get_task(1) != 0
+
+    def test_regenerated(self):
+        """
+        Test to ensure a changed CSV isn't read from the old cache, and the cache follows our own saves
+        """
+        DB(self.path, sidecar=True)
+        with open(self.path) as f:
+            lines = f.readlines()
+        with open(self.path, "w") as f:
+            f.writelines(lines[:11])
+        assert len(DB(self.path, sidecar=True)) == 10
+        assert len(os.listdir(self.cache)) == 1
+
+        db = DB(self.path, sidecar=True)
+        db.update_student(db.get_with_id(1).unwrap().with_mark(1, 0))
+        db.close()
+        reopened = DB(self.path, sidecar=True)
+        assert isinstance(reopened._roster.marks, np.memmap)
+        assert reopened.get_with_id(1).unwrap().get_task(1) == 0
+        parsed = DB(self.path)._roster
+        for column in ("ids", "names", "classes", "epas", "marks", "missing"):
+            assert np.array_equal(getattr(reopened._roster, column), getattr(parsed, column))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from lib.src.struct.sorted_index import SortedIndex
+
+"""
+This file contains tests for the SortedIndex used to rank marks.
+"""
+class TestSortedIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SortedIndex([70, 90, 80, 80, 60])
+
+    def test_rank(self):
+        """
+        Test to ensure ties share the best rank and unknown values rank where they would be inserted
+        """
+        assert self.index.rank(90) == 1
+        assert self.index.rank(80) == 2
+        assert self.index.rank(70) == 4
+        assert self.index.rank(75) == 4
+        assert self.index.rank(100) == 1
+        assert self.index.rank(0) == 6
+
+    def test_update(self):
+        """
+        Test to ensure adding and removing values keeps the index sorted
+        """
+        self.index.remove(80)
+        self.index.add(95)
+        assert self.index.rank(80) == 3
+        assert self.index.count_below(80) == 2
+        assert len(self.index) == 5
+        self.assertRaises(ValueError, self.index.remove, 85)
+
+    def test_nth_largest(self):
+        """
+        Test to ensure positions from the top count tied values separately
+        """
+        assert [self.index.nth_largest(n) for n in range(1, len(self.index) + 1)] == [90, 80, 80, 70, 60]
+        self.assertRaises(IndexError, self.index.nth_largest, 0)
+        self.assertRaises(IndexError, self.index.nth_largest, len(self.index) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
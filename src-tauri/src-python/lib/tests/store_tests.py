@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from importlib.util import spec_from_file_location, module_from_spec
+
+"""
+This file contains tests for the application settings store.
+"""
+
+# Load the store on its own, importing the mltasktauri package would start loading Tauri
+_spec = spec_from_file_location(
+    "mltasktauri_store",
+    os.path.join(os.path.dirname(__file__), "..", "..", "mltasktauri", "store.py"),
+)
+store = module_from_spec(_spec)
+_spec.loader.exec_module(store)
+
+
+class TestStore(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.folder = os.path.join(self.dir, "app", "data")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_create(self):
+        """
+        Test to ensure a missing folder is created along with a valid empty store
+        """
+        s = store.Store(self.folder)
+        with open(s.get_path()) as f:
+            assert json.load(f) == {}
+        assert s.get_value("fileLocation") is None
+
+    def test_set_values(self):
+        """
+        Test to ensure batched values are written once and survive reopening the store
+        """
+        s = store.Store(self.folder)
+        s.set_values({"fileLocation": "a.csv", "theme": "dark"})
+        stamp = os.stat(s.get_path()).st_mtime_ns
+        s.set_value("theme", "dark")
+        assert os.stat(s.get_path()).st_mtime_ns == stamp
+
+        reopened = store.Store(self.folder)
+        assert reopened.get_value("fileLocation") == "a.csv"
+        assert reopened.get_value("theme") == "dark"
+        assert [f for f in os.listdir(self.folder) if f.endswith(".tmp")] == []
+
+    def test_external_change(self):
+        """
+        Test to ensure changes made to the file by something else are picked up
+        """
+        s = store.Store(self.folder)
+        s.set_value("fileLocation", "a.csv")
+        with open(s.get_path(), "w") as f:
+            json.dump({"fileLocation": "somewhere/else.csv"}, f)
+        assert s.get_value("fileLocation") == "somewhere/else.csv"
+
+
+if __name__ == '__main__':
+    unittest.main()
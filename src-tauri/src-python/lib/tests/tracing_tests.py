@@ -0,0 +1,45 @@
+import unittest
+
+from lib.src.processes.db import DB
+from lib.src.processes.ml import calculate_mark
+from lib.src.processes.tracing import tracer
+
+"""
+This file contains tests for tracing the decisions made by calculate_mark.
+"""
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.db = DB("./students_marks.csv")
+        self.students = [s.with_mark(3, None) for s in self.db.get_all(include_invalid=False).unwrap()[:50]]
+
+    def tearDown(self):
+        tracer.reset()
+
+    def test_disabled(self):
+        """
+        Test to ensure nothing is recorded while tracing is disabled
+        """
+        tracer.reset()
+        calculate_mark(self.db, self.students[0], 3)
+        assert tracer.traces() == [] and tracer.histogram() == {}
+
+    def test_cohort(self):
+        """
+        Test to ensure every calculation of a cohort run is traced without changing the marks
+        """
+        untraced = [calculate_mark(self.db, s, 3).unwrap() for s in self.students]
+        with tracer.tracing():
+            traced = [calculate_mark(self.db, s, 3).unwrap() for s in self.students]
+        assert not tracer.enabled
+        assert traced == untraced
+
+        traces = tracer.traces()
+        assert sum(tracer.histogram().values()) == len(traces) == len(self.students)
+        for trace, s, mark in zip(traces, self.students, traced):
+            assert trace["student_id"] == s.get_id() and trace["values"]["mark"] == mark
+            assert set(trace["timings"]) == {"ranks", "rank_marks", "epa_marks", "decision"}
+            assert len(trace["values"]["ranks"]) == 3
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,8 @@
+import os
 import sys
-from typing import Union, TypeVar, Any, Coroutine
+import threading
+from importlib import import_module
+from typing import Union, TypeVar, Any, Coroutine, TYPE_CHECKING
 
 from anyio.from_thread import start_blocking_portal
 from pydantic import BaseModel, RootModel
@@ -11,11 +14,23 @@ from pytauri import (
 from pytauri.ffi.path import PathResolver
 from pytauri.ffi.webview import WebviewWindow
 
-from lib.src.processes.ml import calculate_mark
 from lib.src.struct.students import Student
-from lib.src.processes.db import DB
+from mltasktauri.metrics import InstrumentedCommands, MetricsDumper, metrics, phase
+from mltasktauri.offload import configure_limits, run_database, run_prediction
 from mltasktauri.store import Store
 
+# The analytics stack (NumPy, pandas) is only imported when first used, see `warm_up_analytics`
+if TYPE_CHECKING:
+    from lib.src.processes.db import DB
+
+ANALYTICS_MODULES = ["lib.src.processes.registry", "lib.src.processes.ml"]
+
+# File in the app data dir the command metrics are written to
+METRICS_FILE = "metrics.json"
+
+# Store keys holding the number of worker threads for each kind of blocking work
+THREAD_LIMIT_KEYS = {"databaseThreads": "database", "predictionThreads": "prediction"}
+
 commands: Commands = Commands()
 
 
@@ -32,6 +47,35 @@ def get_app_store() -> Store:
         raise ValueError("AppStore is not initialized.")
     return AppStore
 
+def get_database() -> "DB":
+    """
+    Get the shared database for the file currently selected in the application store.
+    """
+    with phase("load"):
+        from lib.src.processes.registry import get_db
+        return get_db(get_app_store().get_value("fileLocation"))
+
+def apply_thread_limits(values: dict[str, Any]) -> None:
+    """
+    Apply the worker thread limits found in a set of store values, see `mltasktauri.offload`.
+    Missing or invalid limits are ignored.
+    """
+    limits = {kind: values.get(key) for key, kind in THREAD_LIMIT_KEYS.items()}
+    configure_limits(**{kind: limit for kind, limit in limits.items() if isinstance(limit, int) and limit > 0})
+
+def warm_up_analytics() -> threading.Thread:
+    """
+    Import the analytics stack in a background thread, so the window can be shown straight away
+    and the first command doesn't have to wait for the whole import.
+    """
+    def _import():
+        for module in ANALYTICS_MODULES:
+            import_module(module)
+
+    thread = threading.Thread(target=_import, name="warm-up-analytics", daemon=True)
+    thread.start()
+    return thread
+
 def main() -> int:
     global AppStore
     global appdata_dir
@@ -46,9 +90,26 @@ def main() -> int:
 
         appdata_dir = path_resolver.app_data_dir()
         AppStore = Store(appdata_dir)
+        apply_thread_limits({key: AppStore.get_value(key) for key in THREAD_LIMIT_KEYS})
+
+        warm_up_analytics()
+
+        # Write the command metrics to the app data dir every `metricsDumpInterval` seconds, if set
+        interval = AppStore.get_value("metricsDumpInterval")
+        dumper = None
+        if isinstance(interval, (int, float)) and interval > 0:
+            dumper = MetricsDumper(os.path.join(appdata_dir, METRICS_FILE), interval).start()
 
         exit_code = app.run_return()
 
+        if dumper is not None:
+            dumper.stop()
+
+        # Write journaled edits back into the roster CSV
+        if "lib.src.processes.registry" in sys.modules:
+            from lib.src.processes.registry import registry
+            registry.close_all()
+
         return exit_code
 
 
@@ -69,29 +130,84 @@ class PYStudent(BaseModel):
             tasks=student.get_all_tasks(),
         )
 
-def init_commands(_commands: Commands):
+def init_commands(_commands: Commands | InstrumentedCommands):
     @_commands.command()
     async def get_students() -> RootModel[list[PYStudent]]:
         """
         Get all students in the database.
         """
+        def _get_students():
+            students = get_database().get_all().unwrap()
+            return RootModel([PYStudent.from_student(s) for s in students])
 
-        database = DB(get_app_store().get_value("fileLocation"))
-        students = database.get_all().unwrap()
+        return await run_database(_get_students)
+
+    class GetStudentColumnsBody(BaseModel):
+        class_id: int | None = None
+        missing_only: bool = False
+
+    @_commands.command()
+    async def get_student_columns(body: GetStudentColumnsBody) -> bytes:
+        """
+        Get students as column arrays in one pre-serialized payload, see `lib.src.processes.payload`.
+        Much cheaper than `get_students` for large rosters, as no model is built per student.
+        """
+        database = await run_database(get_database)
+        return await run_database(lambda: database.get_columns(_c=body.class_id, missing_only=body.missing_only).unwrap())
 
+    class GetStudentsSinceBody(BaseModel):
+        version: int = 0
 
-        return RootModel([PYStudent.from_student(s) for s in students])
+    @_commands.command()
+    async def get_students_since(body: GetStudentsSinceBody) -> bytes:
+        """
+        Get the students added or changed since a data version, in the `get_student_columns` layout with the
+        current "version" and a "full" flag. If "full" is set, the students replace everything the frontend has.
+        """
+        database = await run_database(get_database)
+        return await run_database(lambda: database.get_columns_since(body.version).unwrap())
+
+    class QueryStudentsBody(BaseModel):
+        offset: int = 0
+        limit: int = 20
+        sort: str = "id"
+        descending: bool = False
+        class_id: int | None = None
+        missing: bool | None = None
+        search: str | None = None
+
+    class StudentPage(BaseModel):
+        total: int
+        students: list[PYStudent]
+
+    @_commands.command()
+    async def query_students(body: QueryStudentsBody) -> StudentPage:
+        """
+        Get one page of students, filtered and sorted in Python so only the visible rows are sent.
+        """
+        database = await run_database(get_database)
+        total, students = (await run_database(
+            database.query_students,
+            offset=body.offset,
+            limit=body.limit,
+            sort=body.sort,
+            descending=body.descending,
+            _c=body.class_id,
+            missing=body.missing,
+            search=body.search,
+        )).unwrap()
+        return StudentPage(total=total, students=[PYStudent.from_student(s) for s in students])
 
     class GetStudentByIdBody(BaseModel):
         student_id: int
 
-    @commands.command()
+    @_commands.command()
     async def get_student_by_id(body: GetStudentByIdBody) -> RootModel[PYStudent | None]:
         """
         Get a student by ID.
         """
-        database = DB(get_app_store().get_value("fileLocation"))
-        student = database.get_with_id(body.student_id).unwrap()
+        database = await run_database(get_database)
+        student = (await run_database(database.get_with_id, body.student_id)).unwrap()
         if student is None:
             return RootModel(None)
         return RootModel(PYStudent.from_student(student))
@@ -116,14 +232,38 @@ def init_commands(_commands: Commands):
         Returns:
             int: The calculated mark for the student on the specified task.
         """
-        database = DB(get_app_store().get_value("fileLocation"))
-        student = database.get_with_id(body.student_id).unwrap()
-        new_mark = calculate_mark(database, student, body.task_id).unwrap()
+        database = await run_database(get_database)
 
-        print("Generated mark:", new_mark)
+        def _generate_mark():
+            from lib.src.processes.ml import calculate_mark_cached
+            student = database.get_with_id(body.student_id).unwrap()
+            return calculate_mark_cached(database, student, body.task_id).unwrap()
 
+        new_mark = await run_prediction(_generate_mark)
         return RootModel(new_mark)
 
+    @_commands.command()
+    async def get_prediction_cache_stats() -> RootModel[dict[str, int]]:
+        """
+        Get the hit and miss counters and size of the mark prediction cache.
+        """
+        from lib.src.processes.ml import prediction_cache
+        return RootModel(prediction_cache.stats())
+
+    @_commands.command()
+    async def get_metrics() -> RootModel[dict[str, Any]]:
+        """
+        Get the call counts, latency histograms and response sizes of every command called so far,
+        along with the prediction cache counters and traced decision branches once predictions have run.
+        """
+        snapshot = {"commands": metrics.snapshot()}
+        if "lib.src.processes.ml" in sys.modules:
+            from lib.src.processes.ml import prediction_cache
+            from lib.src.processes.tracing import tracer
+            snapshot["prediction_cache"] = prediction_cache.stats()
+            snapshot["prediction_branches"] = tracer.histogram()
+        return RootModel(snapshot)
+
     class SetStudentMarkBody(BaseModel):
         student_id: int
         task_id: int
@@ -134,28 +274,25 @@ def init_commands(_commands: Commands):
         """
         Set a student's mark for a specific task.
         """
-        database = DB(get_app_store().get_value("fileLocation"))
-        student = database.get_with_id(body.student_id).unwrap()
-        if student is None:
-            return b"null"
-
-        student.update_mark(body.task_id, body.mark, override=True)
-
-        database.update_student(student)
+        database = await run_database(get_database)
+        # Read and store the student in one step, so a concurrent edit of another mark isn't lost
+        await run_database(database.set_mark, body.student_id, body.task_id, body.mark)
 
         return b"null"
 
     class GetDataKeyBody(BaseModel):
         key: str
 
-    @commands.command()
+    @_commands.command()
     async def check_students_with_missing_tasks() -> RootModel[list[PYStudent]]:
         """
         Get all students with missing tasks.
         """
-        database = DB(get_app_store().get_value("fileLocation"))
-        students = database.get_all_with_missing_tasks().unwrap()
-        return RootModel([PYStudent.from_student(s) for s in students])
+        def _get_students():
+            students = get_database().get_all_with_missing_tasks().unwrap()
+            return RootModel([PYStudent.from_student(s) for s in students])
+
+        return await run_database(_get_students)
 
     @_commands.command()
     async def get_data_key(body: GetDataKeyBody) -> RootModel[Any]:
@@ -177,6 +314,20 @@ def init_commands(_commands: Commands):
         """
         _store = get_app_store()
         _store.set_value(body.key, body.value)
+        apply_thread_limits({body.key: body.value})
+        return b"null"
+
+    class SetDataKeysBody(BaseModel):
+        values: dict[str, Any]
+
+    @_commands.command()
+    async def set_data_keys(body: SetDataKeysBody) -> bytes:
+        """
+        Set several values in the application store with a single write.
+        """
+        _store = get_app_store()
+        _store.set_values(body.values)
+        apply_thread_limits(body.values)
         return b"null"
 
     class UpdateStudentBody(BaseModel):
@@ -187,11 +338,7 @@ def init_commands(_commands: Commands):
         """
         Update a student's information in the database.
         """
-        database = DB(get_app_store().get_value("fileLocation"))
-
-        # Generate a new ID
-        if body.student.id == -1:
-            body.student.id = database.get_next_id()
+        database = await run_database(get_database)
 
         student = Student(
             id=body.student.id,
@@ -200,7 +347,12 @@ def init_commands(_commands: Commands):
             epa=body.student.epa,
             tasks=body.student.tasks
         )
-        database.update_student(student)
+
+        # A new student, given the next ID in the same step it is stored in
+        if body.student.id == -1:
+            await run_database(database.add_student, student)
+        else:
+            await run_database(database.update_student, student)
         return b"null"
 
-init_commands(commands)
\ No newline at end of file
+init_commands(InstrumentedCommands(commands))
\ No newline at end of file
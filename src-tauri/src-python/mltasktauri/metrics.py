@@ -0,0 +1,265 @@
+"""
+Per-command metrics for the IPC commands.
+
+Every command registered through `InstrumentedCommands` counts its calls and errors, and records the
+latency of each call split into phases:
+
+    load       time spent in `phase("load")` blocks, i.e. opening or reloading the roster
+    compute    the rest of the command
+    serialize  turning the response model into bytes
+
+along with the size of the response. Commands are wrapped before being handed to pytauri, and serialize
+their own response, so the serialization time can be measured.
+"""
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import signature
+from typing import Any, Callable
+
+from pydantic import BaseModel
+
+from lib.src.processes.saver import write_temp_file
+
+# Upper bounds of the latency histogram buckets, in seconds. The last bucket catches everything slower.
+LATENCY_BUCKETS = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0]
+
+# Upper bounds of the response size histogram buckets, in bytes
+PAYLOAD_BUCKETS = [1 << 10, 10 << 10, 100 << 10, 1 << 20, 10 << 20, 100 << 20]
+
+PHASES = ["load", "compute", "serialize"]
+
+# Phase timings of the command running in the current context
+_current: ContextVar[dict[str, float] | None] = ContextVar("command_phases", default=None)
+
+
+class Histogram:
+    """
+    Counts of observed values per bucket, with their total and maximum.
+    """
+
+    def __init__(self, bounds: list[float]):
+        """
+        Args:
+            bounds: Ascending upper bounds of the buckets. Values above the last bound go to an extra bucket.
+        """
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._total = 0.0
+        self._max = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self._total += value
+        self._max = max(self._max, value)
+
+    def to_dict(self) -> dict[str, Any]:
+        count = sum(self._counts)
+        return {
+            "count": count,
+            "total": self._total,
+            "mean": self._total / count if count else 0.0,
+            "max": self._max,
+            "buckets": {
+                **{f"<={bound:g}": c for bound, c in zip(self._bounds, self._counts)},
+                f">{self._bounds[-1]:g}": self._counts[-1],
+            },
+        }
+
+
+class CommandMetrics:
+    """
+    Metrics of one command.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency = {phase: Histogram(LATENCY_BUCKETS) for phase in ["total", *PHASES]}
+        self.payload = Histogram(PAYLOAD_BUCKETS)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency": {phase: h.to_dict() for phase, h in self.latency.items()},
+            "payload": self.payload.to_dict(),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe collection of `CommandMetrics` by command name.
+    """
+
+    def __init__(self):
+        self._commands: dict[str, CommandMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, command: str, phases: dict[str, float], payload: int | None) -> None:
+        """
+        Record one call of a command.
+
+        Args:
+            command: Command name
+            phases: Seconds spent in each phase, plus "total"
+            payload: Size of the response in bytes, None if the command failed
+        """
+        with self._lock:
+            metrics = self._commands.setdefault(command, CommandMetrics())
+            metrics.calls += 1
+            for phase, seconds in phases.items():
+                metrics.latency[phase].observe(seconds)
+            if payload is None:
+                metrics.errors += 1
+            else:
+                metrics.payload.observe(payload)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Get the metrics of every command that has been called.
+
+        Returns:
+            dict[str, Any]: Metrics by command name
+        """
+        with self._lock:
+            return {name: m.to_dict() for name, m in sorted(self._commands.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._commands.clear()
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def phase(name: str):
+    """
+    Attribute the time spent in a block to a phase of the running command, e.g. "load".
+    Outside of a command, nothing is recorded.
+
+    Args:
+        name: One of `PHASES`
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases = _current.get()
+        if phases is not None:
+            phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def instrument(command: str, func: Callable) -> Callable:
+    """
+    Wrap an async command handler to record its metrics. The wrapper serializes BaseModel responses
+    itself, so its signature returns bytes.
+
+    Args:
+        command: Command name the metrics are recorded under
+        func: The command handler, returning a BaseModel or bytes
+
+    Returns:
+        Callable: The instrumented handler
+    """
+    sig = signature(func)
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs) -> bytes:
+        phases = {"load": 0.0}
+        token = _current.set(phases)
+        start = time.perf_counter()
+        payload = None
+        try:
+            response = await func(*args, **kwargs)
+            computed = time.perf_counter()
+            if isinstance(response, BaseModel):
+                response = type(response).__pydantic_serializer__.to_json(response)
+            phases["serialize"] = time.perf_counter() - computed
+            payload = len(response)
+            return response
+        finally:
+            _current.reset(token)
+            phases["total"] = time.perf_counter() - start
+            phases["compute"] = max(0.0, phases["total"] - phases["load"] - phases.get("serialize", 0.0))
+            metrics.record(command, phases, payload)
+
+    wrapper.__signature__ = sig.replace(return_annotation=bytes)
+    return wrapper
+
+
+class InstrumentedCommands:
+    """
+    Stands in for `pytauri.Commands` when registering commands, instrumenting every handler with `instrument`.
+    """
+
+    def __init__(self, commands):
+        """
+        Args:
+            commands: The `pytauri.Commands` to register the instrumented handlers with
+        """
+        self._commands = commands
+
+    def command(self, command: str | None = None):
+        """
+        Decorator registering an instrumented command handler, see `pytauri.Commands.command`.
+
+        Args:
+            command: Name of the command. If not provided, the name of the handler is used.
+        """
+        def register(func: Callable) -> Callable:
+            name = command or func.__name__
+            return self._commands.command(name)(instrument(name, func))
+        return register
+
+
+class MetricsDumper:
+    """
+    Periodically writes the metrics snapshot to a JSON file, replacing it atomically.
+    """
+
+    def __init__(self, path: str, interval: float):
+        """
+        Args:
+            path: File to write
+            interval: Seconds between writes
+        """
+        self._path = path
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+
+    def start(self) -> "MetricsDumper":
+        self._thread.start()
+        return self
+
+    def dump(self) -> None:
+        """
+        Write the current snapshot now.
+        """
+        snapshot = {"time": time.time(), "commands": metrics.snapshot()}
+        tmp = write_temp_file(self._path, lambda f: json.dump(snapshot, f, indent=2))
+        os.replace(tmp, self._path)
+
+    def stop(self) -> None:
+        """
+        Stop the periodic writes, writing a last snapshot.
+        """
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.dump()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self.dump()
+            except OSError:
+                pass
@@ -0,0 +1,89 @@
+"""
+Running blocking command work off the event loop.
+
+Commands are served by a single asyncio loop, so anything that blocks it, e.g. loading a roster or
+calculating a mark, delays every other command. Such work runs in worker threads instead, limited by two
+capacity limiters: one for database work and a smaller one for predictions, so a burst of predictions can't
+take every thread. Predictions only hold the database lock while they read from it, see `calculate_mark`,
+and fit their regressions outside it, so several can run at once. Commands that only touch in-memory
+settings, like `get_data_key`, stay on the loop.
+"""
+
+import os
+from functools import partial
+from typing import Callable, TypeVar
+
+from anyio import CapacityLimiter, to_thread
+
+T = TypeVar("T")
+
+# Default number of threads per kind of work
+DEFAULT_DATABASE_THREADS = 4
+DEFAULT_PREDICTION_THREADS = max(1, min(2, (os.cpu_count() or 1) - 1))
+
+_limits = {"database": DEFAULT_DATABASE_THREADS, "prediction": DEFAULT_PREDICTION_THREADS}
+_limiters: dict[str, CapacityLimiter] = {}
+
+
+def configure_limits(database: int | None = None, prediction: int | None = None) -> None:
+    """
+    Change how many threads may run each kind of work at once. Takes effect straight away, work already
+    running isn't interrupted.
+
+    Args:
+        database: Threads for database work, unchanged if None
+        prediction: Threads for predictions, unchanged if None
+    """
+    for kind, limit in (("database", database), ("prediction", prediction)):
+        if limit is None:
+            continue
+        _limits[kind] = max(1, int(limit))
+        if kind in _limiters:
+            _limiters[kind].total_tokens = _limits[kind]
+
+
+def get_limits() -> dict[str, int]:
+    """
+    Get the number of threads allowed per kind of work.
+
+    Returns:
+        dict[str, int]: Limit for "database" and "prediction" work
+    """
+    return dict(_limits)
+
+
+def _limiter(kind: str) -> CapacityLimiter:
+    # Created on first use, from within the event loop
+    if kind not in _limiters:
+        _limiters[kind] = CapacityLimiter(_limits[kind])
+    return _limiters[kind]
+
+
+async def run_database(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run blocking database work in a worker thread.
+
+    Args:
+        func: Function to call
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        T: The return value of func
+    """
+    return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=_limiter("database"))
+
+
+async def run_prediction(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a mark prediction in a worker thread.
+
+    Args:
+        func: Function to call
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        T: The return value of func
+    """
+    return await to_thread.run_sync(partial(func, *args, **kwargs), limiter=_limiter("prediction"))
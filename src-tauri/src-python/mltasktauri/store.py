@@ -1,34 +1,80 @@
 import json
 import os
+import threading
+from typing import Any
+
+from lib.src.processes.saver import write_temp_file
+
 
 class Store:
+    """
+    JSON key-value store for application settings.
+
+    The values are kept in memory and the file is only read again when it changes on disk, which is
+    checked with a `stat` on each read. Writes replace the file atomically, so a crash never leaves it
+    half written.
+    """
+
     def __init__(self, folder, name = "store"):
         self.folder = folder
         self.path = os.path.join(folder, name + ".json")
+        self._data: dict[str, Any] = {}
+        self._stamp: tuple[int, int] | None = None
+        self._lock = threading.Lock()
 
-        os.mkdir(self.path) if not os.path.exists(folder) else None
+        os.makedirs(folder, exist_ok=True)
 
         if not os.path.exists(self.path):
-            with open(self.path, 'w') as f:
-                f.write('{filePath:None}')
+            self._write({})
 
     def get_path(self):
         return self.path
 
-    def get_value(self, key):
+    def _stat(self) -> tuple[int, int] | None:
         try:
-            with open(self.path, 'r') as f:
-                data = json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
-            data = {}
-        return data.get(key, None)
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
 
-    def set_value(self, key, value):
+    def _refresh(self) -> None:
+        """
+        Reload the values if the file changed on disk since it was last read or written.
+        """
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return
         try:
             with open(self.path, 'r') as f:
                 data = json.load(f)
         except (json.JSONDecodeError, FileNotFoundError):
             data = {}
-        data[key] = value
-        with open(self.path, 'w') as f:
-            json.dump(data, f)
\ No newline at end of file
+        self._data = data if isinstance(data, dict) else {}
+        self._stamp = stamp
+
+    def _write(self, data: dict[str, Any]) -> None:
+        tmp = write_temp_file(self.path, lambda f: json.dump(data, f))
+        os.replace(tmp, self.path)
+        self._data = data
+        self._stamp = self._stat()
+
+    def get_value(self, key):
+        with self._lock:
+            self._refresh()
+            return self._data.get(key, None)
+
+    def set_value(self, key, value):
+        self.set_values({key: value})
+
+    def set_values(self, values: dict[str, Any]) -> None:
+        """
+        Set several values with a single write. Nothing is written if none of the values change.
+
+        Args:
+            values: Values by key
+        """
+        with self._lock:
+            self._refresh()
+            if all(key in self._data and self._data[key] == value for key, value in values.items()):
+                return
+            self._write({**self._data, **values})
@@ -1,6 +1,5 @@
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import {useNavigate} from "react-router";
-import { pyInvoke } from "tauri-plugin-pytauri-api";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select.tsx";
 import { Label } from "@/components/ui/label.tsx";
 import { Input } from "@/components/ui/input.tsx";
@@ -35,7 +34,7 @@ import {
 import * as z from "zod";
 import { zodResolver } from "@hookform/resolvers/zod";
 import { useForm } from "react-hook-form";
-import {updateStudent as updateDBStudent } from "@/lib/utils.ts";
+import {getStudentsSince, updateStudent as updateDBStudent } from "@/lib/utils.ts";
 
 type HomePageProps = {
   csvPath: string;
@@ -172,6 +171,8 @@ const HomePage: React.FC<HomePageProps> = ({ csvPath }) => {
   const [loading, setLoading] = useState(true);
 
   const [students, setStudents] = useState<Student[]>([]);
+  // Data version of the loaded students, so a reload only fetches the students changed since
+  const version = useRef(0);
   const [filterBy, setFilterBy] = useState("id");
   const [searchQuery, setSearchQuery] = useState("");
 
@@ -237,6 +238,7 @@ const HomePage: React.FC<HomePageProps> = ({ csvPath }) => {
 
   useEffect(() => {
     if (csvPath) {
+      version.current = 0;
       updateStudents();
     }
   }, [csvPath]);
@@ -244,7 +246,13 @@ const HomePage: React.FC<HomePageProps> = ({ csvPath }) => {
   const updateStudents = async () => {
     setLoading(true);
     try {
-      const s = await pyInvoke<Student[]>("get_students", { csvPath });
+      const changes = await getStudentsSince(version.current);
+      version.current = changes.version;
+
+      // Merge the changed students into the loaded ones, unless they replace everything
+      const byId = new Map<number, Student>(changes.full ? [] : students.map(stu => [stu.id, stu]));
+      changes.students.forEach(stu => byId.set(stu.id, stu));
+      const s = [...byId.values()].sort((a, b) => a.id - b.id);
       if (s) {
         setStudents(s);
 
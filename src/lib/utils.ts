@@ -15,6 +15,34 @@ export const setStoreValue = async (key: string, value: any): Promise<void> => {
   await pyInvoke("set_data_key", { "key": key, "value": value });
 };
 
+export const setStoreValues = async (values: Record<string, any>): Promise<void> => {
+  await pyInvoke("set_data_keys", { "values": values });
+};
+
+type StudentColumns = {
+  ids: number[];
+  names: string[];
+  class_id: number[];
+  epa: number[];
+  tasks: (number|null)[][];
+};
+
+const fromColumns = (columns: StudentColumns): Student[] => {
+  return columns.ids.map((id, i) => ({
+    id,
+    name: columns.names[i],
+    class_id: columns.class_id[i],
+    epa: columns.epa[i],
+    tasks: columns.tasks.map(task => task[i]),
+  }));
+}
+
+// Students changed since `version`. If `full` is set, they replace every student the caller has.
+export const getStudentsSince = async (version: number): Promise<{ version: number, full: boolean, students: Student[] }> => {
+  const columns = await pyInvoke<StudentColumns & { version: number, full: boolean }>("get_students_since", { "version": version });
+  return { version: columns.version, full: columns.full, students: fromColumns(columns) };
+}
+
 export const getStudent = async (id: string|number): Promise<any> => {
   return await pyInvoke("get_student_by_id", { "student_id": Number(id) });
 }